@@ -28,6 +28,10 @@ Like this: 'class Player(abstract.AbstractPlayer):'
         """
         raise NotImplementedError
 
+    def game_over(self):
+        """Called by the runner once the game ended, so that the player can stop its background work."""
+        pass
+
     def __repr__(self):
         return self.color
 
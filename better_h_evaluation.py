@@ -0,0 +1,193 @@
+"""The evaluation of the better_h players, and its weights, shared by better_h_player and improved_better_h_player.
+
+A player inherits from BetterHPlayer, which adds the utility and its evaluation cache key to SearchPlayer. The
+weights are the constants below, or the ones of a weights file written by tuning.py, whose features are named after
+WEIGHT_NAMES.
+"""
+# ===============================================================================
+# Imports
+# ===============================================================================
+
+import json
+import search_player
+from utils import INFINITY
+from checkers.consts import PAWN_COLOR, KING_COLOR, OPPONENT_COLOR, MAX_TURNS_NO_JUMP, RED_PLAYER, BLACK_PLAYER
+from checkers.consts import NUM_SQUARES, LOC_SQUARES
+from checkers.moves import SQUARE_ROWS, SQUARE_COLS, SQUARE_DISTANCES
+from checkers.bitboard import locs_to_bitboard
+
+# ===============================================================================
+# Globals
+# ===============================================================================
+
+PAWN_WEIGHT = 2
+KING_WEIGHT = 3
+CENTER = 0.7
+BACK_LINE = 0.9
+ATTACKED = -2
+RUN_AWAY_KING = -1
+KING_ATTACK = 4
+
+# The names of the weights above, as they appear in a weights file (see tuning.py)
+WEIGHT_NAMES = ('PAWN_WEIGHT', 'KING_WEIGHT', 'CENTER', 'BACK_LINE', 'ATTACKED', 'RUN_AWAY_KING', 'KING_ATTACK')
+
+# The center of the board, and the back line squares guarded by each player's pawns
+CENTER_LOCS = [(3, 3), (3, 5), (4, 2), (4, 4)]
+BACK_LINE_LOCS = {
+    BLACK_PLAYER: [(7, 1), (7, 3), (7, 5)],
+    RED_PLAYER: [(0, 2), (0, 4), (0, 6)],
+}
+CENTER_MASK = locs_to_bitboard(CENTER_LOCS)
+BACK_LINE_MASK = {color: locs_to_bitboard(locs) for color, locs in BACK_LINE_LOCS.items()}
+# The position of every square in the order of the board dict, so that distances are summed in the same order
+# whether the kings come from a board or from a piece list.
+BOARD_ORDER = [SQUARE_COLS[sq] * NUM_SQUARES + SQUARE_ROWS[sq] for sq in range(NUM_SQUARES)]
+
+
+def load_weights(path=None):
+    """The weights of the evaluation, a dict of the form name:value.
+
+    :param path: A JSON file of the same form, written by tuning.py, whose weights replace the constants above.
+                 Weights missing from it keep their constant values. None returns the constants.
+    """
+    weights = {name: globals()[name] for name in WEIGHT_NAMES}
+    if path is not None:
+        with open(path) as f:
+            loaded = json.load(f)
+        unknown = set(loaded) - set(WEIGHT_NAMES)
+        if unknown:
+            raise ValueError('Unknown weights in {}: {}'.format(path, ', '.join(sorted(unknown))))
+        weights.update(loaded)
+    return weights
+
+
+# ===============================================================================
+# Player
+# ===============================================================================
+
+class BetterHPlayer(search_player.SearchPlayer):
+    def __init__(self, setup_time, player_color, time_per_k_turns, k, transposition_table_mb=0,
+                 move_ordering=False, search_workers=1, tablebase_path=None,
+                 opening_book_path=None, stats_path=None, ponder=False,
+                 principal_variation=False, quiescence_plies=0, weights_path=None,
+                 evaluation_cache_entries=0, batch_evaluation=False):
+        search_player.SearchPlayer.__init__(self, setup_time, player_color, time_per_k_turns, k,
+                                            transposition_table_mb=transposition_table_mb, move_ordering=move_ordering,
+                                            search_workers=search_workers, tablebase_path=tablebase_path,
+                                            opening_book_path=opening_book_path, stats_path=stats_path, ponder=ponder,
+                                            principal_variation=principal_variation, quiescence_plies=quiescence_plies,
+                                            evaluation_cache_entries=evaluation_cache_entries,
+                                            batch_evaluation=batch_evaluation)
+        # The weights of the evaluation, the constants above unless a weights file written by tuning.py is given.
+        self.weights = load_weights(weights_path)
+        self.curr_board = None  # save the current game board
+        # The squares of the kings of each color on curr_board, and the board they were found on
+        self.curr_king_squares = None
+        self.curr_king_squares_board = None
+
+    def end_move(self, game_state, move):
+        self.curr_board = game_state.board  # save game board
+        search_player.SearchPlayer.end_move(self, game_state, move)
+
+    # sum utility of our heuristic over all the tools of the given color, computed on the state's bitboards
+    def sum_util(self, state, color):
+        weights = self.weights
+        tools = state.player_tools(color)
+        h_sum = weights['CENTER'] * (tools & CENTER_MASK).bit_count()  # being in the center of the board is good
+        # being in the back line is good
+        h_sum += weights['BACK_LINE'] * state.tool_count(PAWN_COLOR[color], BACK_LINE_MASK[color])
+        # being in a position that could be attacked is bad
+        h_sum += weights['ATTACKED'] * state.attacked_tools(color).bit_count()
+        return h_sum
+
+    # the sum of the distances between every king of one color and every king of the other
+    @staticmethod
+    def kings_distance(my_king_squares, op_king_squares):
+        dist = 0
+        for sq_1 in my_king_squares:
+            row = sq_1 * NUM_SQUARES
+            for sq_2 in op_king_squares:
+                dist += SQUARE_DISTANCES[row + sq_2]
+        return dist
+
+    # the squares of the kings of the given color on curr_board, in the board's order. They are found once per
+    # curr_board, rather than with a scan of the board for every evaluated state.
+    def curr_kings(self, color):
+        if self.curr_king_squares_board is not self.curr_board:
+            self.curr_king_squares = {
+                king_color: [LOC_SQUARES[loc] for loc, loc_val in self.curr_board.items()
+                             if loc_val == KING_COLOR[king_color]]
+                for king_color in (RED_PLAYER, BLACK_PLAYER)}
+            self.curr_king_squares_board = self.curr_board
+        return self.curr_king_squares[color]
+
+    # when only (or mostly) kings are left in the game, if we have more kings than the opponent we want to push our
+    # kings towards the opponent to attack, and if we have less kings than the opponent we want our kings to run away
+    # and increase their distance from the opponent tools.
+    def only_kings_util(self, state, color, my_king_num, op_king_num):
+        opponent_color = OPPONENT_COLOR[color]
+        # current distance sum:
+        curr_dist = self.kings_distance(self.curr_kings(color), self.curr_kings(opponent_color))
+        # next distance sum, over the piece lists of the state:
+        next_dist = self.kings_distance(sorted(state.tool_squares(KING_COLOR[color]), key=BOARD_ORDER.__getitem__),
+                                        sorted(state.tool_squares(KING_COLOR[opponent_color]),
+                                               key=BOARD_ORDER.__getitem__))
+
+        if curr_dist >= next_dist:
+            # distance decreases
+            if my_king_num > op_king_num:
+                # we have more kings, increase utility so we get closer to opponent in order to attack
+                return self.weights['KING_ATTACK']
+            else:
+                # we have less kings, decrease utility so we don't get closer to opponent (run away)
+                return self.weights['RUN_AWAY_KING']
+        return 0
+
+    # the key of the utility of a state in the evaluation cache. The utility is 0 once there were too many turns
+    # without jumps, which the Zobrist key does not tell, so those states are not cached. When only kings are left,
+    # the utility also depends on the kings of curr_board, which are then part of the key.
+    def evaluation_key(self, state):
+        if state.turns_since_last_jump >= MAX_TURNS_NO_JUMP:
+            return None
+        red_kings = state.red & state.kings
+        black_kings = state.black & state.kings
+        if ((state.red ^ red_kings).bit_count() < red_kings.bit_count()
+                and (state.black ^ black_kings).bit_count() < black_kings.bit_count()):
+            return state.zobrist_key, tuple(self.curr_kings(RED_PLAYER)), tuple(self.curr_kings(BLACK_PLAYER))
+        return state.zobrist_key
+
+    def utility(self, state):
+        # A state without possible moves never gets here: the search scores it as a win or a loss.
+        if state.turns_since_last_jump >= MAX_TURNS_NO_JUMP:
+            return 0
+
+        opponent_color = OPPONENT_COLOR[self.color]
+        my_h_sum = self.sum_util(state, self.color)  # add heuristic utility
+        op_h_sum = self.sum_util(state, opponent_color)  # add heuristic utility
+        my_pawns = state.tool_count(PAWN_COLOR[self.color])
+        my_kings = state.tool_count(KING_COLOR[self.color])
+        op_pawns = state.tool_count(PAWN_COLOR[opponent_color])
+        op_kings = state.tool_count(KING_COLOR[opponent_color])
+
+        # if there are mostly kings on the board we want to activate the "only_kings" utility:
+        if my_pawns < my_kings and op_pawns < op_kings:
+            my_h_sum += self.only_kings_util(state, self.color, my_kings, op_kings)
+            op_h_sum += self.only_kings_util(state, opponent_color, op_kings, my_kings)
+
+        # sum total utility
+        pawn_weight = self.weights['PAWN_WEIGHT']
+        king_weight = self.weights['KING_WEIGHT']
+        my_u = (pawn_weight * my_pawns) + (king_weight * my_kings) + my_h_sum
+        op_u = (pawn_weight * op_pawns) + (king_weight * op_kings) + op_h_sum
+        if my_u == 0:
+            # I have no tools left
+            return -INFINITY
+        elif op_u == 0:
+            # The opponent has no tools left
+            return INFINITY
+        else:
+            return my_u - op_u
+
+    def selective_deepening_criterion(self, state):
+        #  player does not selectively deepen into certain nodes.
+        return False
@@ -0,0 +1,106 @@
+"""
+Bitboard tables used by GameState.
+
+A bitboard is an int holding one bit per playable square, where bit n stands for SQUARE_LOCS[n].
+Moving a set of tools one square in a direction is a shift, but on this square numbering the shift
+depends on the row parity, so each direction is described by a few (source mask, left shift, right shift)
+steps. All of the tables below are derived from the move tables in moves.py.
+"""
+
+# ===============================================================================
+# Imports
+# ===============================================================================
+
+from .consts import (RED_PLAYER, BLACK_PLAYER,
+                     BACK_ROW,
+                     SQUARE_LOCS, LOC_SQUARES, NUM_SQUARES)
+from .moves import (DOWN_RIGHT_SINGLE_MOVES, DOWN_LEFT_SINGLE_MOVES,
+                    UP_RIGHT_SINGLE_MOVES, UP_LEFT_SINGLE_MOVES,
+                    DOWN_RIGHT_CAPTURE_MOVES, DOWN_LEFT_CAPTURE_MOVES,
+                    UP_RIGHT_CAPTURE_MOVES, UP_LEFT_CAPTURE_MOVES)
+
+
+# ===============================================================================
+# Functions
+# ===============================================================================
+
+def squares(bb):
+    """Yields the square numbers of the bits set in bb, lowest first."""
+    while bb:
+        low = bb & -bb
+        yield low.bit_length() - 1
+        bb ^= low
+
+
+def locs_to_bitboard(locs):
+    """Returns the bitboard of the given board locations (2-tuples)."""
+    bb = 0
+    for loc in locs:
+        bb |= 1 << LOC_SQUARES[loc]
+    return bb
+
+
+def _single_steps(single_moves):
+    """Groups the sources of a single move direction table by their square offset.
+
+    :param single_moves: A dict of the form location:location, like DOWN_RIGHT_SINGLE_MOVES.
+    :return: A tuple of (source mask, left shift, right shift) 3-tuples.
+    """
+    masks = {}
+    for origin, target in single_moves.items():
+        offset = LOC_SQUARES[target] - LOC_SQUARES[origin]
+        masks[offset] = masks.get(offset, 0) | (1 << LOC_SQUARES[origin])
+    return tuple((mask, max(offset, 0), max(-offset, 0))
+                 for offset, mask in sorted(masks.items()))
+
+
+def _capture_steps(capture_moves):
+    """Groups the sources of a capture direction table by their jumped and landing square offsets.
+
+    :param capture_moves: A dict of the form location:(jumped location, final location), like
+        DOWN_RIGHT_CAPTURE_MOVES.
+    :return: A tuple of (source mask, jumped left shift, jumped right shift, landing left shift,
+        landing right shift) 5-tuples.
+    """
+    masks = {}
+    for origin, (jumped, target) in capture_moves.items():
+        offsets = (LOC_SQUARES[jumped] - LOC_SQUARES[origin], LOC_SQUARES[target] - LOC_SQUARES[origin])
+        masks[offsets] = masks.get(offsets, 0) | (1 << LOC_SQUARES[origin])
+    return tuple((mask, max(jumped, 0), max(-jumped, 0), max(target, 0), max(-target, 0))
+                 for (jumped, target), mask in sorted(masks.items()))
+
+
+# ===============================================================================
+# Bitboard Constants
+# ===============================================================================
+
+FULL_BOARD = (1 << NUM_SQUARES) - 1
+
+# The squares on which a pawn of each player is crowned.
+PROMOTION_MASK = {
+    player: locs_to_bitboard(loc for loc in SQUARE_LOCS if loc[0] == BACK_ROW[player])
+    for player in (RED_PLAYER, BLACK_PLAYER)
+}
+
+DOWN_RIGHT_STEPS = _single_steps(DOWN_RIGHT_SINGLE_MOVES)
+DOWN_LEFT_STEPS = _single_steps(DOWN_LEFT_SINGLE_MOVES)
+UP_RIGHT_STEPS = _single_steps(UP_RIGHT_SINGLE_MOVES)
+UP_LEFT_STEPS = _single_steps(UP_LEFT_SINGLE_MOVES)
+
+DOWN_RIGHT_CAPTURE_STEPS = _capture_steps(DOWN_RIGHT_CAPTURE_MOVES)
+DOWN_LEFT_CAPTURE_STEPS = _capture_steps(DOWN_LEFT_CAPTURE_MOVES)
+UP_RIGHT_CAPTURE_STEPS = _capture_steps(UP_RIGHT_CAPTURE_MOVES)
+UP_LEFT_CAPTURE_STEPS = _capture_steps(UP_LEFT_CAPTURE_MOVES)
+
+# Steps assigned to specific players by color. Order is the same as in the move tables.
+PAWN_STEPS = {
+    RED_PLAYER: DOWN_RIGHT_STEPS + DOWN_LEFT_STEPS,
+    BLACK_PLAYER: UP_RIGHT_STEPS + UP_LEFT_STEPS,
+}
+KING_STEPS = PAWN_STEPS[BLACK_PLAYER] + PAWN_STEPS[RED_PLAYER]
+
+PAWN_CAPTURE_STEPS = {
+    RED_PLAYER: DOWN_RIGHT_CAPTURE_STEPS + DOWN_LEFT_CAPTURE_STEPS,
+    BLACK_PLAYER: UP_RIGHT_CAPTURE_STEPS + UP_LEFT_CAPTURE_STEPS,
+}
+KING_CAPTURE_STEPS = PAWN_CAPTURE_STEPS[BLACK_PLAYER] + PAWN_CAPTURE_STEPS[RED_PLAYER]
@@ -1,114 +1,234 @@
 """A game-specific implementations of utility functions.
 """
 from __future__ import print_function, division
+from collections import namedtuple
 from .consts import *
 from .moves import *
+from .bitboard import (FULL_BOARD, PROMOTION_MASK,
+                       PAWN_STEPS, KING_STEPS, PAWN_CAPTURE_STEPS, KING_CAPTURE_STEPS,
+                       squares, locs_to_bitboard)
+from .zobrist import ZOBRIST_TOOLS, ZOBRIST_BLACK_TO_MOVE, zobrist_key
+
+# All the board locations, in the key order of the original dict board.
+BOARD_LOCS = tuple((i, j)
+                   for j in range(BOARD_COLS)
+                   for i in range(BOARD_ROWS))
+EMPTY_BOARD = {loc: EM for loc in BOARD_LOCS}
+
+# Everything GameState.undo_move needs in order to take back a move:
+# captured - bitboard of the jumped tools, captured_kings - the kings among them,
+# promoted - whether the moved pawn was crowned, and the turns_since_last_jump, curr_player and zobrist_key
+# before the move.
+MoveUndo = namedtuple('MoveUndo', ['captured', 'captured_kings', 'promoted', 'turns_since_last_jump', 'curr_player',
+                                   'zobrist_key'])
 
 
 class GameState:
     def __init__(self):
         """ Initializing the board and current player.
-        """
-        self.board = {(i, j): EM
-                      for j in range(BOARD_COLS)
-                      for i in range(BOARD_ROWS)}
 
-        for i in range(3):
-            for j in range(BOARD_COLS):
-                if IS_BLACK_TILE((i, j)):
-                    self.board[(i, j)] = RP
-
-        for i in range(3):
-            cur_i = BOARD_ROWS - i - 1
-            for j in range(BOARD_COLS):
-                if IS_BLACK_TILE((cur_i, j)):
-                    self.board[(cur_i, j)] = BP
+        The board is kept as three bitboards (see checkers.bitboard): the red tools, the black tools and
+        the kings of both colors.
+        """
+        self.red = locs_to_bitboard(loc for loc in SQUARE_LOCS if loc[0] < 3)
+        self.black = locs_to_bitboard(loc for loc in SQUARE_LOCS if loc[0] >= BOARD_ROWS - 3)
+        self.kings = 0
 
         self.curr_player = RED_PLAYER
         self.turns_since_last_jump = 0
+        self.zobrist_key = zobrist_key(self.red, self.black, self.kings, self.curr_player)
+        self._board = None
+
+    @classmethod
+    def from_bitboards(cls, red, black, kings, curr_player, turns_since_last_jump=0):
+        """A state with the given tools (see checkers.bitboard) and player to move, instead of the opening one."""
+        state = cls.__new__(cls)
+        state.red = red
+        state.black = black
+        state.kings = kings
+        state.curr_player = curr_player
+        state.turns_since_last_jump = turns_since_last_jump
+        state.zobrist_key = zobrist_key(red, black, kings, curr_player)
+        state._board = None
+        return state
+
+    @property
+    def board(self):
+        """A dict of the form 2-tuple:tool holding all the board locations, like the original board.
+        It is a snapshot that is rebuilt after the state changes, so it must not be modified.
+        """
+        if self._board is None:
+            board = EMPTY_BOARD.copy()
+            for sq in squares(self.red):
+                board[SQUARE_LOCS[sq]] = RP
+            for sq in squares(self.black):
+                board[SQUARE_LOCS[sq]] = BP
+            for sq in squares(self.kings):
+                board[SQUARE_LOCS[sq]] = KING_COLOR[RED_PLAYER] if self.red >> sq & 1 else KING_COLOR[BLACK_PLAYER]
+            self._board = board
+        return self._board
+
+    def player_tools(self, player):
+        """The bitboard of all the tools of the given player."""
+        return self.red if player == RED_PLAYER else self.black
+
+    def tools(self, tool):
+        """The bitboard of the tools of the given type (RP, RK, BP or BK)."""
+        if tool == RP:
+            return self.red & ~self.kings
+        if tool == RK:
+            return self.red & self.kings
+        if tool == BP:
+            return self.black & ~self.kings
+        return self.black & self.kings
+
+    def tool_count(self, tool, mask=FULL_BOARD):
+        """The number of tools of the given type, optionally only on the squares of a bitboard mask.
+        Counting bits takes constant time, so material and square-table terms need no scan of the board.
+        """
+        return (self.tools(tool) & mask).bit_count()
+
+    def tool_squares(self, tool):
+        """The squares of the tools of the given type (RP, RK, BP or BK), lowest first."""
+        return tuple(squares(self.tools(tool)))
 
     def calc_single_moves(self):
         """Calculating all the possible single moves.
         :return: All the legitimate single moves for this game state.
         """
-        single_pawn_moves = [GameMove(self.board[i], i, j)
-                             for (i, js) in PAWN_SINGLE_MOVES[self.curr_player].items()
-                             if self.board[i] == PAWN_COLOR[self.curr_player]
-                             for j in js
-                             if self.board[j] == EM]
-        single_king_moves = [GameMove(self.board[i], i, j)
-                             for (i, js) in KING_SINGLE_MOVES.items()
-                             if self.board[i] == KING_COLOR[self.curr_player]
-                             for j in js
-                             if self.board[j] == EM]
-        return single_pawn_moves + single_king_moves
+        empty = ~(self.red | self.black) & FULL_BOARD
+        mine = self.player_tools(self.curr_player)
+        moves = []
+        for tools, tool_type, tool_steps in ((mine & ~self.kings, PAWN_COLOR[self.curr_player],
+                                              PAWN_STEPS[self.curr_player]),
+                                             (mine & self.kings, KING_COLOR[self.curr_player], KING_STEPS)):
+            for mask, left, right in tool_steps:
+                for target in squares(((tools & mask) << left) >> right & empty):
+                    origin = target + right - left
+                    moves.append(GameMove(tool_type, SQUARE_LOCS[origin], SQUARE_LOCS[target], None,
+                                          origin | target << MOVE_TARGET_SHIFT))
+        return moves
+
+    def _capture_origins(self):
+        """The bitboard of the current player's tools that have a jump available."""
+        empty = ~(self.red | self.black) & FULL_BOARD
+        mine = self.player_tools(self.curr_player)
+        opponents = self.player_tools(OPPONENT_COLOR[self.curr_player])
+        origins = 0
+        for tools, tool_steps in ((mine & ~self.kings, PAWN_CAPTURE_STEPS[self.curr_player]),
+                                  (mine & self.kings, KING_CAPTURE_STEPS)):
+            for mask, j_left, j_right, t_left, t_right in tool_steps:
+                tools_in_mask = tools & mask
+                jumped = ((tools_in_mask << j_left) >> j_right) & opponents
+                targets = ((tools_in_mask << t_left) >> t_right) & empty
+                origins |= ((jumped << j_right) >> j_left) & ((targets << t_right) >> t_left)
+        return origins
+
+    def has_capture(self):
+        """Whether the current player has a jump available, and so must capture."""
+        return self._capture_origins() != 0
+
+    def has_any_move(self):
+        """Whether the current player has a legal move. Much cheaper than get_possible_moves, since it only looks
+        for the first one.
+        """
+        if self._capture_origins():
+            return True
+        empty = ~(self.red | self.black) & FULL_BOARD
+        mine = self.player_tools(self.curr_player)
+        for tools, tool_steps in ((mine & ~self.kings, PAWN_STEPS[self.curr_player]),
+                                  (mine & self.kings, KING_STEPS)):
+            for mask, left, right in tool_steps:
+                if ((tools & mask) << left) >> right & empty:
+                    return True
+        return False
+
+    def attacked_tools(self, player):
+        """The bitboard of the given player's tools that the opponent could jump over if it was its turn."""
+        empty = ~(self.red | self.black) & FULL_BOARD
+        mine = self.player_tools(player)
+        opponent = OPPONENT_COLOR[player]
+        opponents = self.player_tools(opponent)
+        attacked = 0
+        for tools, tool_steps in ((opponents & ~self.kings, PAWN_CAPTURE_STEPS[opponent]),
+                                  (opponents & self.kings, KING_CAPTURE_STEPS)):
+            for mask, j_left, j_right, t_left, t_right in tool_steps:
+                targets = ((tools & mask) << t_left) >> t_right & empty
+                attackers = (targets << t_right) >> t_left
+                attacked |= ((attackers << j_left) >> j_right) & mine
+        return attacked
 
     def calc_capture_moves(self):
         """Calculating all the possible capture moves, but only the first step.
         :return: All the legitimate single capture moves for this game state.
         """
-        capture_pawn_moves = [(i, j, k)
-                              for i, i_capts in PAWN_CAPTURE_MOVES[self.curr_player].items()
-                              if self.board[i] == PAWN_COLOR[self.curr_player]
-                              for j, k in i_capts
-                              if self.board[j] in OPPONENT_COLORS[self.curr_player]
-                              and self.board[k] == EM]
-        capture_king_moves = [(i, j, k)
-                              for i, i_capts in KING_CAPTURE_MOVES.items()
-                              if self.board[i] == KING_COLOR[self.curr_player]
-                              for j, k in i_capts
-                              if self.board[j] in OPPONENT_COLORS[self.curr_player]
-                              and self.board[k] == EM]
-        return capture_pawn_moves + capture_king_moves
-
-    def find_all_capture_sequence(self, origin_loc, cur_loc, possible_moves, already_jumped):
-        """
-        Calculating all possible capture sequences from cur_loc, using moves in
-        possible_moves, avoiding jumping locations in already_jumped
-        
-        Arguments:
-        cur_loc: 2-tuple containing origin location for jump sequence
-        possible_moves: all jump moves allowed for player whos sequences we are calculating
-        already_jumped: list of 2-tuples of locations of players previously eaten in current sequence
-        
-        :return: list of 2-tuples where:
-            [0] Sequence final location
-            [1] list of jumped tools by this sequence
+        opponents = self.player_tools(OPPONENT_COLOR[self.curr_player])
+        empty = ~(self.red | self.black) & FULL_BOARD
+        captures = []
+        for origin in squares(self._capture_origins()):
+            tool = KING_COLOR[self.curr_player] if self.kings >> origin & 1 else PAWN_COLOR[self.curr_player]
+            for jumped, target in SQUARE_CAPTURE_MOVES[tool][origin]:
+                if opponents >> jumped & 1 and empty >> target & 1:
+                    captures.append((SQUARE_LOCS[origin], SQUARE_LOCS[jumped], SQUARE_LOCS[target]))
+        return captures
+
+    def _capture_moves(self, origin, tool, opponents, free):
+        """Yields the capture moves of the tool on the origin square: its sequences of jumps that can not go on.
+
+        The sequences are walked depth first with an explicit stack. The jumped tools are kept in a bitboard and in
+        one path list shared by all the sequences, so nothing is allocated until a sequence ends.
+
+        :param origin: The square of the jumping tool.
+        :param tool: The type of the jumping tool (RP, RK, BP or BK).
+        :param opponents: The bitboard of the opponent tools.
+        :param free: The bitboard of the squares a jump may end on (the empty squares and the origin).
         """
-        possible_next_jumps = [(jumped, next_loc)
-                               for jumped, next_loc in possible_moves[cur_loc]
-                               if self.board[jumped] in OPPONENT_COLORS[self.curr_player]  # Jumping opponent tool
-                               and (self.board[next_loc] == EM or next_loc == origin_loc)  # Target location is empty
-                               and jumped not in already_jumped]  # I have not jumped this tool yet in this sequence
-
-        capture_seqs = []
-        for jumped, next_loc in possible_next_jumps:
-            cur_seqs = self.find_all_capture_sequence(origin_loc,
-                                                      next_loc,
-                                                      possible_moves,
-                                                      already_jumped + [jumped])
-            for target, seq in cur_seqs:
-                capture_seqs.append((target, [jumped] + seq))
-
-        if len(capture_seqs) == 0:
-            return [(cur_loc, [])]
-        else:
-            return capture_seqs
+        square_captures = SQUARE_CAPTURE_MOVES[tool]
+        origin_loc = SQUARE_LOCS[origin]
+        path = []
+        jumped = 0
+        # Every frame is [square, index of the next capture to try, whether a jump was made from the square].
+        stack = [[origin, 0, False]]
+        while stack:
+            frame = stack[-1]
+            captures = square_captures[frame[0]]
+            i = frame[1]
+            while i < len(captures):
+                jumped_sq, next_sq = captures[i]
+                i += 1
+                jumped_bit = 1 << jumped_sq
+                if opponents & jumped_bit and not jumped & jumped_bit and free >> next_sq & 1:
+                    frame[1] = i
+                    frame[2] = True
+                    path.append(jumped_sq)
+                    jumped |= jumped_bit
+                    stack.append([next_sq, 0, False])
+                    break
+            else:
+                stack.pop()
+                if not frame[2]:
+                    # No jump continues the sequence from this square, so it ends here.
+                    yield GameMove(tool, origin_loc, SQUARE_LOCS[frame[0]], [SQUARE_LOCS[sq] for sq in path],
+                                   move_code(origin, frame[0], jumped))
+                if path:
+                    jumped ^= 1 << path.pop()
 
     def get_possible_moves(self):
         """Return a list of possible moves for this state.
         Each possible move is represented by GameMove object.
         """
-        possible_capture_moves = self.calc_capture_moves()
-        if possible_capture_moves:
-            capture_origins = set(origin for origin, _, _ in possible_capture_moves)
+        capture_origins = self._capture_origins()
+        if capture_origins:
+            opponents = self.player_tools(OPPONENT_COLOR[self.curr_player])
+            empty = ~(self.red | self.black) & FULL_BOARD
             capture_seqs = []
-            for origin in capture_origins:
-                cur_seqs = self.find_all_capture_sequence(origin, origin,
-                                                          TOOL_CAPTURE_MOVES[self.board[origin]],
-                                                          [])
-                for target, seq in cur_seqs:
-                    capture_seqs.append(GameMove(self.board[origin], origin, target, seq))
+            for origin in squares(capture_origins):
+                if self.kings >> origin & 1:
+                    tool = KING_COLOR[self.curr_player]
+                else:
+                    tool = PAWN_COLOR[self.curr_player]
+                # The origin is free to land on, as the tool has left it: a king may loop back to it.
+                capture_seqs.extend(self._capture_moves(origin, tool, opponents, empty | (1 << origin)))
 
             return capture_seqs
 
@@ -116,24 +236,78 @@ class GameState:
         return self.calc_single_moves()
 
     def perform_move(self, move):
-        self.board[move.origin_loc] = EM
-        if (move.player_type == PAWN_COLOR[self.curr_player]
-                and move.target_loc[0] == BACK_ROW[self.curr_player]):
-            # If moved pawn to back row, turn to king and put in target
-            self.board[move.target_loc] = KING_COLOR[self.curr_player]
+        """Performs the move on this state.
+
+        :param move: A GameMove that is legal in this state.
+        :return: A MoveUndo record, to be given to undo_move along with the same move.
+        """
+        code = move.code
+        origin_sq = code & MOVE_SQUARE_MASK
+        target_sq = code >> MOVE_TARGET_SHIFT & MOVE_SQUARE_MASK
+        jumped = code >> MOVE_JUMPED_SHIFT
+        origin_bit = 1 << origin_sq
+        target_bit = 1 << target_sq
+        was_king = move.player_type == KING_COLOR[self.curr_player]
+        promoted = not was_king and bool(target_bit & PROMOTION_MASK[self.curr_player])
+
+        key = self.zobrist_key ^ ZOBRIST_BLACK_TO_MOVE ^ ZOBRIST_TOOLS[move.player_type][origin_sq]
+        key ^= ZOBRIST_TOOLS[KING_COLOR[self.curr_player] if promoted else move.player_type][target_sq]
+        opponent = OPPONENT_COLOR[self.curr_player]
+        for sq in squares(jumped):
+            key ^= ZOBRIST_TOOLS[KING_COLOR[opponent] if self.kings >> sq & 1 else PAWN_COLOR[opponent]][sq]
+
+        undo = MoveUndo(jumped, jumped & self.kings, promoted, self.turns_since_last_jump, self.curr_player,
+                        self.zobrist_key)
+
+        if self.curr_player == RED_PLAYER:
+            self.red = (self.red & ~origin_bit) | target_bit
+            self.black &= ~jumped
         else:
-            # Move tool to target
-            self.board[move.target_loc] = move.player_type
+            self.black = (self.black & ~origin_bit) | target_bit
+            self.red &= ~jumped
 
-        for loc in move.jumped_locs:
-            self.board[loc] = EM
-        if len(move.jumped_locs) > 0:
+        self.kings &= ~(origin_bit | jumped)
+        if was_king or promoted:
+            # A king stays a king, and a pawn that moved to the back row turns to king
+            self.kings |= target_bit
+
+        if jumped:
             self.turns_since_last_jump = 0
         else:
             self.turns_since_last_jump += 0.5
 
-            # Updating the current player.
-        self.curr_player = OPPONENT_COLOR[self.curr_player]
+        # Updating the current player.
+        self.curr_player = opponent
+        self.zobrist_key = key
+        self._board = None
+        return undo
+
+    def undo_move(self, move, undo):
+        """Takes back a move, restoring the state from before perform_move.
+
+        :param move: The last move performed on this state.
+        :param undo: The MoveUndo record perform_move returned for it.
+        """
+        origin_bit = 1 << (move.code & MOVE_SQUARE_MASK)
+        target_bit = 1 << (move.code >> MOVE_TARGET_SHIFT & MOVE_SQUARE_MASK)
+
+        if undo.curr_player == RED_PLAYER:
+            self.red = (self.red & ~target_bit) | origin_bit
+            self.black |= undo.captured
+        else:
+            self.black = (self.black & ~target_bit) | origin_bit
+            self.red |= undo.captured
+
+        if move.player_type == KING_COLOR[undo.curr_player]:
+            self.kings = (self.kings & ~target_bit) | origin_bit
+        elif undo.promoted:
+            self.kings &= ~target_bit
+        self.kings |= undo.captured_kings
+
+        self.turns_since_last_jump = undo.turns_since_last_jump
+        self.curr_player = undo.curr_player
+        self.zobrist_key = undo.zobrist_key
+        self._board = None
 
     def draw_board(self):
         print("  " + " ".join([str(i) for i in range(BOARD_COLS)]))
@@ -145,13 +319,21 @@ class GameState:
             print(line_sep)
         print("\n" + self.curr_player + " Player Turn!\n\n")
 
+    def __deepcopy__(self, memo):
+        """The state holds only immutable values, so a shallow copy is a deep copy."""
+        new_state = GameState.__new__(GameState)
+        new_state.__dict__.update(self.__dict__)
+        new_state._board = None
+        return new_state
+
     def __hash__(self):
         """This object can be inserted into a set or as dict key. NOTICE: Changing the object after it has been inserted
         into a set or dict (as key) may have unpredicted results!!!
         """
-        return hash(','.join([self.board[(i, j)]
-                              for i in range(BOARD_ROWS)
-                              for j in range(BOARD_COLS)] + [self.curr_player]))
+        return self.zobrist_key
 
     def __eq__(self, other):
-        return isinstance(other, GameState) and self.board == other.board and self.curr_player == other.curr_player
+        # Comparing the keys first rejects almost all unequal states with a single int comparison.
+        return (isinstance(other, GameState) and self.zobrist_key == other.zobrist_key
+                and self.red == other.red and self.black == other.black
+                and self.kings == other.kings and self.curr_player == other.curr_player)
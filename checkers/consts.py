@@ -22,6 +22,15 @@ BOARD_ROWS = BOARD_COLS = 8
 
 IS_BLACK_TILE = lambda loc: (loc[0] + loc[1]) % 2 == 0
 
+# The black tiles are the only playable squares. They are numbered 0..31 row by row (four per row),
+# and a square's number is its bit index in the bitboards held by GameState.
+SQUARE_LOCS = tuple((i, j)
+                    for i in range(BOARD_ROWS)
+                    for j in range(BOARD_COLS)
+                    if IS_BLACK_TILE((i, j)))
+LOC_SQUARES = {loc: sq for sq, loc in enumerate(SQUARE_LOCS)}
+NUM_SQUARES = len(SQUARE_LOCS)
+
 # Assigning colors per tool and player type
 PAWN_COLOR = {
     RED_PLAYER: RP,
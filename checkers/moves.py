@@ -6,18 +6,33 @@ This file holds all objects relating to the moves possible in the game.
 # Imports
 # ===============================================================================
 
+from array import array
 from .consts import (RED_PLAYER, BLACK_PLAYER,
                      BOARD_ROWS, BOARD_COLS,
                      IS_BLACK_TILE,
+                     SQUARE_LOCS, LOC_SQUARES, NUM_SQUARES,
                      RP, RK, BP, BK)
 
+# Bit layout of GameMove.code.
+MOVE_TARGET_SHIFT = 5
+MOVE_JUMPED_SHIFT = 10
+MOVE_SQUARE_MASK = (1 << MOVE_TARGET_SHIFT) - 1
+MOVE_FROM_TO_MASK = (1 << MOVE_JUMPED_SHIFT) - 1
+
+
+def move_code(origin_sq, target_sq, jumped=0):
+    """Packs a move into an int: the origin square, the target square and the bitboard of the jumped squares."""
+    return origin_sq | target_sq << MOVE_TARGET_SHIFT | jumped << MOVE_JUMPED_SHIFT
+
 
 # ===============================================================================
 # Classes
 # ===============================================================================
 
 class GameMove:
-    def __init__(self, player_type, origin_loc, target_loc, jumped_locs=None):
+    __slots__ = ('player_type', 'origin_loc', 'target_loc', 'jumped_locs', 'code')
+
+    def __init__(self, player_type, origin_loc, target_loc, jumped_locs=None, code=None):
         """
         :param: player_type of the tool moved, could be RP, RK, BP, BK
         :param: origin_loc a 2-tuple defining the location on the board of the tool
@@ -25,11 +40,36 @@ class GameMove:
             to move the tool to. In multiple jumps this is the final destination.
         :param: jumped_locs is a list of tools we jumped during our move. If this
             is None or an empty list, this is an ordinary move and not a jump
+        :param: code the packed move (see move_code), when the caller already has it
         """
         self.player_type = player_type
         self.origin_loc = origin_loc
         self.target_loc = target_loc
         self.jumped_locs = jumped_locs if jumped_locs is not None else []
+        if code is None:
+            code = move_code(LOC_SQUARES[origin_loc], LOC_SQUARES[target_loc],
+                             sum(1 << LOC_SQUARES[loc] for loc in self.jumped_locs))
+        # The move packed into an int (see move_code), used for equality, hashing and the search tables.
+        self.code = code
+
+    @property
+    def origin_sq(self):
+        return self.code & MOVE_SQUARE_MASK
+
+    @property
+    def target_sq(self):
+        return self.code >> MOVE_TARGET_SHIFT & MOVE_SQUARE_MASK
+
+    @property
+    def jumped(self):
+        """The bitboard of the jumped tools."""
+        return self.code >> MOVE_JUMPED_SHIFT
+
+    def __eq__(self, other):
+        return isinstance(other, GameMove) and self.code == other.code
+
+    def __hash__(self):
+        return self.code
 
     def __str__(self):
         s = " ".join(["Move", self.player_type,
@@ -126,6 +166,23 @@ KING_CAPTURE_MOVES = {(i, j): UP_CAPTURE_MOVES[(i, j)] + DOWN_CAPTURE_MOVES[(i,
                       for j in range(BOARD_COLS)
                       if IS_BLACK_TILE((i, j))}
 
+
+# Capture threats are the capture moves turned around
+def calc_capture_threats(capture_moves):
+    threats = {loc: [] for loc in capture_moves}
+    for origin, jumps in capture_moves.items():
+        for jumped, target in jumps:
+            threats[jumped].append((origin, target))
+    return threats
+
+
+# The following Dicts are of the form 2-tuple:list of 2-tuples, where the key is a tool location and the value
+# lists the jumps over it in the specified direction, each as a 2-tuple of the location of the jumping tool and its
+# final location. KING_CAPTURE_THREATS holds the jumps over the key location from all directions.
+UP_CAPTURE_THREATS = calc_capture_threats(UP_CAPTURE_MOVES)
+DOWN_CAPTURE_THREATS = calc_capture_threats(DOWN_CAPTURE_MOVES)
+KING_CAPTURE_THREATS = calc_capture_threats(KING_CAPTURE_MOVES)
+
 # Dictionaries assigning possible moves to specific players by color.
 PAWN_SINGLE_MOVES = {
     RED_PLAYER: DOWN_SINGLE_MOVES,
@@ -143,3 +200,49 @@ TOOL_CAPTURE_MOVES = {
     BP: UP_CAPTURE_MOVES,
     BK: KING_CAPTURE_MOVES,
 }
+
+# The jumps over a tool of the given player that the opponent pawns can make.
+PAWN_CAPTURE_THREATS = {
+    RED_PLAYER: UP_CAPTURE_THREATS,
+    BLACK_PLAYER: DOWN_CAPTURE_THREATS,
+}
+
+
+# ===============================================================================
+# Square-Indexed Tables
+# ===============================================================================
+
+# The tables above again, as flat tuples indexed by square number (see SQUARE_LOCS) holding square numbers, so that
+# code walking the occupied squares of a bitboard (see checkers.bitboard.squares) needs no tuple hashing.
+
+def _square_table(loc_table, convert):
+    """Converts a dict of the form location:list, like KING_SINGLE_MOVES, to a tuple indexed by square number.
+
+    :param convert: Converts an entry of the lists to square numbers.
+    """
+    return tuple(tuple(convert(entry) for entry in loc_table[loc]) for loc in SQUARE_LOCS)
+
+
+def _square_pairs(pair):
+    return LOC_SQUARES[pair[0]], LOC_SQUARES[pair[1]]
+
+
+# The row and the column of every square.
+SQUARE_ROWS = array('b', (loc[0] for loc in SQUARE_LOCS))
+SQUARE_COLS = array('b', (loc[1] for loc in SQUARE_LOCS))
+
+# For every tool type, a tuple indexed by square number holding the (jumped square, final square) pairs of the jumps
+# from that square, in the order of TOOL_CAPTURE_MOVES.
+SQUARE_CAPTURE_MOVES = {tool: _square_table(capture_moves, _square_pairs)
+                        for tool, capture_moves in TOOL_CAPTURE_MOVES.items()}
+
+# Tuples indexed by square number holding the (jumping square, final square) pairs of the jumps over that square,
+# like PAWN_CAPTURE_THREATS and KING_CAPTURE_THREATS.
+PAWN_SQUARE_CAPTURE_THREATS = {color: _square_table(threats, _square_pairs)
+                               for color, threats in PAWN_CAPTURE_THREATS.items()}
+KING_SQUARE_CAPTURE_THREATS = _square_table(KING_CAPTURE_THREATS, _square_pairs)
+
+# The euclidean distance between every two squares, the one between a and b at index a * NUM_SQUARES + b.
+SQUARE_DISTANCES = array('d', (((SQUARE_ROWS[a] - SQUARE_ROWS[b]) ** 2 + (SQUARE_COLS[a] - SQUARE_COLS[b]) ** 2) ** 0.5
+                               for a in range(NUM_SQUARES)
+                               for b in range(NUM_SQUARES)))
@@ -0,0 +1,53 @@
+"""
+Zobrist hashing of game states.
+
+A state's key is the XOR of a fixed random 64-bit value for every (tool, square) pair on the board, and of
+ZOBRIST_BLACK_TO_MOVE when it is the black player's turn. GameState updates its key on every move.
+"""
+
+# ===============================================================================
+# Imports
+# ===============================================================================
+
+import random
+from .consts import RED_PLAYER, BLACK_PLAYER, NUM_SQUARES, KING_COLOR, PAWN_COLOR, RP, RK, BP, BK, MAX_TURNS_NO_JUMP
+from .bitboard import squares
+
+# ===============================================================================
+# Zobrist Constants
+# ===============================================================================
+
+# The table must be the same in every run, so that keys can be stored in files.
+ZOBRIST_SEED = 20170101
+
+_rng = random.Random(ZOBRIST_SEED)
+
+# A dict of the form tool:tuple indexed by square number.
+ZOBRIST_TOOLS = {tool: tuple(_rng.getrandbits(64) for _ in range(NUM_SQUARES))
+                 for tool in (RP, RK, BP, BK)}
+ZOBRIST_BLACK_TO_MOVE = _rng.getrandbits(64)
+# A tuple indexed by twice the turns since the last jump, up to MAX_TURNS_NO_JUMP. It is not part of the state's
+# key, but is mixed into the keys of the search tables (see transposition.search_key).
+ZOBRIST_TURNS = tuple(_rng.getrandbits(64) for _ in range(2 * MAX_TURNS_NO_JUMP + 1))
+
+
+# ===============================================================================
+# Functions
+# ===============================================================================
+
+def zobrist_key(red, black, kings, curr_player):
+    """Computes the key of a position from scratch.
+
+    :param red: The bitboard of the red tools.
+    :param black: The bitboard of the black tools.
+    :param kings: The bitboard of the kings of both colors.
+    :param curr_player: The player to move.
+    :return: The 64-bit Zobrist key.
+    """
+    key = ZOBRIST_BLACK_TO_MOVE if curr_player == BLACK_PLAYER else 0
+    for player, tools in ((RED_PLAYER, red), (BLACK_PLAYER, black)):
+        for sq in squares(tools & ~kings):
+            key ^= ZOBRIST_TOOLS[PAWN_COLOR[player]][sq]
+        for sq in squares(tools & kings):
+            key ^= ZOBRIST_TOOLS[KING_COLOR[player]][sq]
+    return key
@@ -0,0 +1,58 @@
+"""An evaluation cache: the utilities of recently evaluated states, kept with LRU eviction.
+
+The iterative deepening evaluates the leaves of one iteration again as the leaves and inner nodes of the next one,
+and transpositions reach the same leaves within an iteration. A player keeps one cache for the whole game, so that
+the leaves of the previous move's search, which its next search mostly reaches again, are still in it.
+
+The cache is keyed by a key function of the player, usually the Zobrist key of the state. A utility that also
+depends on more than the position (e.g. the turns without jumps, or the board at the root) must put that in the
+key, or return None for the states that are not to be cached.
+"""
+from collections import OrderedDict
+
+
+class EvaluationCache:
+    def __init__(self, entries):
+        """
+        :param entries: The number of utilities the cache holds. The least recently used one is evicted to make
+                        room for a new one.
+        """
+        self.entries = entries
+        self.values = OrderedDict()
+        self.hits = 0
+        self.probes = 0
+
+    def wrap(self, utility, key=None):
+        """A utility function that looks states up in the cache before calling the given one.
+
+        :param utility: The utility function. Should have state as parameter.
+        :param key: A function of the state returning its key in the cache, or None to evaluate it without the
+                    cache. Defaults to the Zobrist key.
+        """
+        values = self.values
+        move_to_end = values.move_to_end
+        entries = self.entries
+
+        def cached_utility(state):
+            state_key = state.zobrist_key if key is None else key(state)
+            if state_key is None:
+                return utility(state)
+            self.probes += 1
+            value = values.get(state_key)
+            if value is not None:
+                self.hits += 1
+                move_to_end(state_key)
+                return value
+            value = utility(state)
+            values[state_key] = value
+            if len(values) > entries:
+                values.popitem(last=False)
+            return value
+
+        return cached_utility
+
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes else 0.0
+
+    def clear(self):
+        self.values.clear()
@@ -0,0 +1,89 @@
+"""Move ordering for the alpha-beta search.
+"""
+from collections import defaultdict
+from checkers.moves import MOVE_FROM_TO_MASK
+
+# Ordering scores of the move classes. History scores stay below KILLER_SCORE.
+HASH_MOVE_SCORE = 1 << 40
+CAPTURE_SCORE = 1 << 32
+KILLER_SCORE = 1 << 30
+
+NUM_KILLERS = 2
+
+
+def move_key(move):
+    """A hashable identity of a move, equal for equal moves generated by different calls."""
+    return move.code
+
+
+class MoveOrderer:
+    def __init__(self):
+        """Orders the moves of a search node so that the moves most likely to cause a cutoff come first:
+        the hash move (the best move of the previous iteration, or from the transposition table),
+        then captures by the number of jumped tools, then the killer moves of the ply, and then the rest by
+        their history score.
+
+        The orderer also counts, per remaining depth, how many cutoffs happened and how many of them were caused
+        by the first move searched.
+        """
+        self.killers = defaultdict(list)  # ply -> move keys of the latest quiet moves that caused a cutoff
+        self.history = defaultdict(int)  # origin and target bits of the move code -> score of quiet cutoff moves
+        self.cutoffs = defaultdict(int)
+        self.first_move_cutoffs = defaultdict(int)
+
+    def new_search(self):
+        """Prepares for searching a new move. Killers are ply-specific so they are dropped, history is aged."""
+        self.killers.clear()
+        for from_to in self.history:
+            self.history[from_to] //= 2
+        self.cutoffs.clear()
+        self.first_move_cutoffs.clear()
+
+    def order_moves(self, moves, ply, hash_move=None):
+        """Returns the moves sorted by how promising they are.
+
+        :param moves: The possible moves of the node.
+        :param ply: The distance of the node from the root.
+        :param hash_move: The best move known for this node, or None.
+        """
+        hash_key = move_key(hash_move) if hash_move is not None else None
+        killers = self.killers.get(ply, ())
+        history = self.history
+
+        def score(move):
+            key = move_key(move)
+            if key == hash_key:
+                return HASH_MOVE_SCORE
+            if move.jumped_locs:
+                return CAPTURE_SCORE + len(move.jumped_locs)
+            if key in killers:
+                return KILLER_SCORE - killers.index(key)
+            return history.get(key & MOVE_FROM_TO_MASK, 0)
+
+        return sorted(moves, key=score, reverse=True)
+
+    def record_cutoff(self, move, ply, depth, move_index):
+        """Updates the tables after a move caused a beta (or alpha) cutoff.
+
+        :param move: The move that caused the cutoff.
+        :param ply: The distance of the node from the root.
+        :param depth: The remaining depth of the node.
+        :param move_index: The position of the move in the searched order.
+        """
+        self.cutoffs[depth] += 1
+        if move_index == 0:
+            self.first_move_cutoffs[depth] += 1
+        if move.jumped_locs:
+            # Captures are already ordered first.
+            return
+        key = move_key(move)
+        killers = self.killers[ply]
+        if key not in killers:
+            killers.insert(0, key)
+            del killers[NUM_KILLERS:]
+        self.history[key & MOVE_FROM_TO_MASK] += depth * depth
+
+    def first_move_cutoff_rates(self):
+        """A dict of the form depth:fraction of the cutoffs at that depth caused by the first move."""
+        return {depth: self.first_move_cutoffs[depth] / count
+                for depth, count in sorted(self.cutoffs.items())}
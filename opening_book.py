@@ -0,0 +1,196 @@
+"""An opening book: the moves worth playing in the positions near the opening one, found by deep offline searches.
+
+The book file is a sorted array of fixed size records, (Zobrist key, origin square, target square, weight, jumped
+squares bitboard), one per book move. It is memory mapped when opened and looked up with a binary search, so
+opening it takes constant time and a lookup only reads a few pages.
+
+The builder walks the positions reachable from the opening one, up to a number of plies. Every position is
+searched to a fixed depth, once per move, and the moves whose values are within a margin of the best one are
+stored, with weights that fall linearly with the distance from the best value. The positions after the stored
+moves of both players are walked next, so the book covers the replies to its own moves and to the ones the
+opponent is likely to play.
+
+    python opening_book.py player book_plies search_depth [path] [--margin M] [--workers N]
+"""
+import argparse
+import bisect
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from checkers.board import GameState
+from checkers.consts import RED_PLAYER, BLACK_PLAYER
+from utils import MiniMaxWithAlphaBetaPruning, INFINITY
+from transposition import TranspositionTable
+from move_ordering import MoveOrderer
+
+MAGIC = b'CHECKERS-BOOK-1'
+HEADER_SIZE = 16
+
+DEFAULT_PATH = 'opening_book.bin'
+
+RECORD_DTYPE = np.dtype([('key', '<u8'), ('origin', 'u1'), ('target', 'u1'), ('weight', '<u2'),
+                         ('jumped', '<u4')])
+
+# The weight of the best move of a position. The weights of the other moves fall linearly to 1 at the margin.
+MAX_WEIGHT = 1000
+
+PLAYERS = (RED_PLAYER, BLACK_PLAYER)
+
+# The size of the transposition tables of every builder worker, in megabytes.
+BUILD_TABLE_MB = 64
+
+
+def move_spec(move):
+    """The (origin square, target square, jumped squares bitboard) of a move, as stored in the book."""
+    return move.origin_sq, move.target_sq, move.jumped
+
+
+# ===============================================================================
+# Building
+# ===============================================================================
+
+# The player of a builder worker process, created by its first task.
+_worker = {}
+
+
+def _analyse(player_name, position, search_depth):
+    """Searches every move of a position. Runs in a worker process.
+
+    :param position: A tuple: (red, black, kings, curr_player), as for GameState.from_bitboards.
+    :return: A list of (move spec, value) pairs, the values being from the point of view of the player to move.
+    """
+    if _worker.get('player_name') != player_name:
+        player_module = __import__('players.{}'.format(player_name), fromlist=['Player'])
+        _worker['player_name'] = player_name
+        _worker['player_module'] = player_module
+        # The stored values are from the searching player's point of view, so every color has its own table.
+        _worker['transposition_tables'] = {color: TranspositionTable(BUILD_TABLE_MB) for color in PLAYERS}
+        _worker['move_orderer'] = MoveOrderer()
+    state = GameState.from_bitboards(*position)
+    transposition_table = _worker['transposition_tables'][state.curr_player]
+    player = _worker['player_module'].Player(INFINITY, state.curr_player, INFINITY, 1)
+    player.curr_board = state.board
+    minimax = MiniMaxWithAlphaBetaPruning(player.utility, player.color, lambda: False,
+                                          player.selective_deepening_criterion,
+                                          transposition_table=transposition_table,
+                                          move_orderer=_worker['move_orderer'])
+    transposition_table.new_search()
+    _worker['move_orderer'].new_search()
+    results = []
+    for move in state.get_possible_moves():
+        undo = state.perform_move(move)
+        value, _ = minimax.search(state, search_depth - 1, -INFINITY, INFINITY, False)
+        state.undo_move(move, undo)
+        results.append((move_spec(move), value))
+    return results
+
+
+def build(player_name, book_plies, search_depth, path, margin=0.5, workers=None):
+    """Builds an opening book with the evaluation of the given player and writes it to path.
+
+    :param player_name: The name of the player module whose utility the searches use, e.g. better_h_player.
+    :param book_plies: The number of plies from the opening position that the book covers.
+    :param search_depth: The depth every book position is searched to.
+    :param margin: How far below the best value a move may be and still be stored.
+    :param workers: The number of worker processes. Defaults to the number of CPUs.
+    """
+    records = []
+    level = {GameState().zobrist_key: GameState()}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for ply in range(book_plies):
+            start_time = time.perf_counter()
+            states = list(level.values())
+            analyses = executor.map(_analyse, [player_name] * len(states),
+                                    [(state.red, state.black, state.kings, state.curr_player) for state in states],
+                                    [search_depth] * len(states))
+            next_level = {}
+            for state, results in zip(states, analyses):
+                if not results:
+                    continue
+                best = max(value for _, value in results)
+                book_specs = {}
+                for (origin, target, jumped), value in results:
+                    if value >= best - margin:
+                        closeness = 1 - (best - value) / margin if margin > 0 else 1
+                        weight = max(1, int(round(MAX_WEIGHT * closeness)))
+                        records.append((state.zobrist_key, origin, target, weight, jumped))
+                        book_specs[(origin, target, jumped)] = weight
+                for move in state.get_possible_moves():
+                    if move_spec(move) in book_specs:
+                        undo = state.perform_move(move)
+                        next_level.setdefault(state.zobrist_key, GameState.from_bitboards(
+                            state.red, state.black, state.kings, state.curr_player, state.turns_since_last_jump))
+                        state.undo_move(move, undo)
+            print('ply {}: {} positions ({:.1f} s)'.format(ply, len(states), time.perf_counter() - start_time))
+            level = next_level
+
+    book = np.array(records, dtype=RECORD_DTYPE)
+    book.sort(order=['key', 'weight'])
+    with open(path, 'wb') as f:
+        f.write(MAGIC.ljust(HEADER_SIZE, b'\0'))
+        book.tofile(f)
+    print('{} moves in {} positions'.format(len(book), len(np.unique(book['key']))))
+
+
+# ===============================================================================
+# Lookup
+# ===============================================================================
+
+class OpeningBook:
+    def __init__(self, path, seed=None):
+        """Opens a book built by build.
+
+        :param path: The book file.
+        :param seed: The seed of the random choice between the book moves of a position.
+        """
+        with open(path, 'rb') as f:
+            header = f.read(HEADER_SIZE)
+        if not header.startswith(MAGIC):
+            raise ValueError('{} is not an opening book file'.format(path))
+        self.records = np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=HEADER_SIZE)
+        self.keys = self.records['key']
+        self.random = random.Random(seed)
+        self.hits = 0
+        self.probes = 0
+
+    def lookup(self, state):
+        """The book moves of a state.
+
+        :return: A list of (move spec, weight) pairs, empty if the state is not in the book.
+        """
+        # bisect reads only the records it compares, where np.searchsorted would copy the strided key column.
+        start = bisect.bisect_left(self.keys, state.zobrist_key)
+        stop = bisect.bisect_right(self.keys, state.zobrist_key, lo=start)
+        return [((int(record['origin']), int(record['target']), int(record['jumped'])), int(record['weight']))
+                for record in self.records[start:stop]]
+
+    def choose(self, state, possible_moves):
+        """Picks a book move of a state at random, by the weights.
+
+        :param possible_moves: The possible moves of the state.
+        :return: One of the possible moves, or None if the state is not in the book.
+        """
+        self.probes += 1
+        book_moves = dict(self.lookup(state))
+        candidates = [move for move in possible_moves if move_spec(move) in book_moves]
+        if not candidates:
+            return None
+        self.hits += 1
+        return self.random.choices(candidates, weights=[book_moves[move_spec(move)] for move in candidates])[0]
+
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes else 0.0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Builds an opening book.')
+    parser.add_argument('player', help='The player module whose utility the searches use, e.g. better_h_player.')
+    parser.add_argument('book_plies', type=int, help='The number of plies from the opening position to cover.')
+    parser.add_argument('search_depth', type=int, help='The depth every book position is searched to.')
+    parser.add_argument('path', nargs='?', default=DEFAULT_PATH, help='The output file.')
+    parser.add_argument('--margin', type=float, default=0.5,
+                        help='How far below the best value a move may be and still be stored.')
+    parser.add_argument('--workers', type=int, default=None, help='The number of worker processes.')
+    args = parser.parse_args()
+    build(args.player, args.book_plies, args.search_depth, args.path, margin=args.margin, workers=args.workers)
@@ -0,0 +1,298 @@
+"""Root-parallel alpha-beta search over worker processes.
+
+The root moves are split between the workers of a SearchPool. The first move (the best move of the previous
+iteration, when there is one) is searched alone, and the rest are then searched in parallel, all sharing the best
+root value found so far as their alpha bound. Every worker keeps its own transposition table and move orderer for
+the whole game.
+
+Running this module prints the nodes per second speedup of the workers over the serial search:
+    python parallel_search.py [player] [max_workers] [depth]
+"""
+import copy
+import multiprocessing
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from utils import MiniMaxWithAlphaBetaPruning, INFINITY
+from transposition import TranspositionTable
+from move_ordering import MoveOrderer, move_key
+from search_stats import SearchStats
+from principal_variation import PrincipalVariationSearch
+
+# Shallower iterations are searched in the calling process, as sending the tasks would cost more than they do.
+PARALLEL_MIN_DEPTH = 3
+
+# How often, in seconds, the calling process checks no_more_time while it waits for the workers.
+WAIT_INTERVAL = 0.005
+
+# The state of a worker process, set by _init_worker.
+_worker = {}
+
+
+def _init_worker(shared_alpha, stop, transposition_table_mb, move_ordering):
+    _worker['shared_alpha'] = shared_alpha
+    _worker['stop'] = stop
+    _worker['transposition_table'] = TranspositionTable(transposition_table_mb) if transposition_table_mb else None
+    _worker['move_orderer'] = MoveOrderer() if move_ordering else None
+    _worker['generation'] = None
+
+
+def _search_root_move(generation, utility, my_color, selective_deepening, batch_utility, tablebase, child_state,
+                      depth, beta, deadline, collect_stats=False, principal_variation=False, quiescence_plies=0):
+    """Searches a root move in a worker process: the state the move leads to, as a min node.
+
+    :param generation: The SearchPool generation. The worker's tables are prepared for a new move when it changes.
+    :param collect_stats: Whether to count the search into a SearchStats, which is sent back with the result.
+    :param principal_variation: Whether to search with a PrincipalVariationSearch.
+    :param quiescence_plies: The quiescence_plies of the search.
+    :return: A tuple: (The value, The alpha the move was searched with, Whether the search was aborted,
+             The number of searched nodes, The SearchStats or None)
+    """
+    transposition_table = _worker['transposition_table']
+    move_orderer = _worker['move_orderer']
+    if generation != _worker['generation']:
+        _worker['generation'] = generation
+        if transposition_table is not None:
+            transposition_table.new_search()
+        if move_orderer is not None:
+            move_orderer.new_search()
+
+    shared_alpha = _worker['shared_alpha']
+    stop = _worker['stop']
+    alpha = shared_alpha.value
+    if alpha >= beta:
+        # Another root move already caused a cutoff.
+        return alpha, alpha, False, 0, None
+
+    stats = SearchStats() if collect_stats else None
+    engine = PrincipalVariationSearch if principal_variation else MiniMaxWithAlphaBetaPruning
+    minimax = engine(utility, my_color, lambda: stop.value, selective_deepening,
+                     transposition_table=transposition_table, move_orderer=move_orderer,
+                     batch_utility=batch_utility, tablebase=tablebase, stats=stats,
+                     quiescence_plies=quiescence_plies)
+    value, _ = minimax.search(child_state, depth - 1, alpha, beta, False, deadline=deadline)
+    if not minimax.aborted:
+        with shared_alpha.get_lock():
+            if value > shared_alpha.value:
+                shared_alpha.value = value
+    return value, alpha, minimax.aborted, minimax.nodes, stats
+
+
+class SearchPool:
+    def __init__(self, workers, transposition_table_mb=0, move_ordering=False):
+        """Worker processes for ParallelMiniMaxWithAlphaBetaPruning. A player creates one for the whole game.
+
+        :param workers: The number of worker processes.
+        :param transposition_table_mb: The size of the transposition table of every worker, 0 turns them off.
+        :param move_ordering: Whether the workers order their moves with a MoveOrderer.
+        """
+        # The players are created and run in threads, which do not mix well with fork.
+        context = multiprocessing.get_context('spawn')
+        self.workers = workers
+        self.shared_alpha = context.Value('d', -INFINITY)
+        self.stop = context.Value('b', False)
+        self.executor = ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker,
+                                            initargs=(self.shared_alpha, self.stop, transposition_table_mb,
+                                                      move_ordering))
+        self.generation = 0
+        # The runner may end the game while a search that ran out of time still runs in its thread.
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def new_search(self):
+        """Prepares the workers' tables for a new move. Call it once before searching for a new move."""
+        self.generation += 1
+
+    def submit(self, fn, *args):
+        """Submits a task to the workers.
+
+        :return: The future of the task, or None if the pool was shut down.
+        """
+        with self.lock:
+            if self.closed:
+                return None
+            return self.executor.submit(fn, *args)
+
+    def shutdown(self):
+        """Stops the searches that still run, and the worker processes."""
+        with self.lock:
+            self.closed = True
+        self.stop.value = True
+        self.executor.shutdown(cancel_futures=True)
+
+
+class ParallelMiniMaxWithAlphaBetaPruning:
+
+    def __init__(self, utility, my_color, no_more_time, selective_deepening, search_pool, transposition_table=None,
+                 move_orderer=None, batch_utility=None, tablebase=None, stats=None, principal_variation=False,
+                 quiescence_plies=0):
+        """A MiniMaxWithAlphaBetaPruning that splits the root moves between the processes of a SearchPool.
+
+        The utility, selective_deepening and batch_utility functions are pickled with every task, so they should be
+        methods of a player that pickles its evaluation state only (see SearchPlayer.__getstate__). The tablebase
+        is sent as its path, and mapped again by the worker.
+
+        :param search_pool: The SearchPool to search in.
+        :param transposition_table: Used by the iterations searched in this process, see PARALLEL_MIN_DEPTH.
+        :param move_orderer: Orders the root moves, and is used by the iterations searched in this process.
+        :param stats: An optional SearchStats. The workers count into their own ones, which are merged into it.
+        :param principal_variation: Whether the root moves, and the iterations searched in this process, are searched
+                                    with a PrincipalVariationSearch. The root moves are always searched with the
+                                    shared alpha.
+        The other parameters are the ones of MiniMaxWithAlphaBetaPruning.
+        """
+        self.utility = utility
+        self.my_color = my_color
+        self.no_more_time = no_more_time
+        self.selective_deepening = selective_deepening
+        self.search_pool = search_pool
+        self.move_orderer = move_orderer
+        self.batch_utility = batch_utility
+        self.tablebase = tablebase
+        self.stats = stats
+        self.principal_variation = principal_variation
+        self.quiescence_plies = quiescence_plies
+        engine = PrincipalVariationSearch if principal_variation else MiniMaxWithAlphaBetaPruning
+        self.serial = engine(utility, my_color, no_more_time, selective_deepening,
+                             transposition_table=transposition_table, move_orderer=move_orderer,
+                             batch_utility=batch_utility, tablebase=tablebase, stats=stats,
+                             quiescence_plies=quiescence_plies)
+        self.nodes = 0
+        self.aborted = False
+
+    def search(self, state, depth, alpha, beta, maximizing_player, pv_move=None, deadline=None):
+        """Start the MiniMax algorithm. The parameters and the result are the ones of MiniMaxWithAlphaBetaPruning.
+
+        Only max nodes are split between the workers, a min root is searched in this process.
+        """
+        if not maximizing_player or depth < PARALLEL_MIN_DEPTH:
+            result = self.serial.search(state, depth, alpha, beta, maximizing_player, pv_move, deadline)
+            self.nodes = self.serial.nodes
+            self.aborted = self.serial.aborted
+            return result
+
+        self.nodes = 1
+        self.aborted = False
+        moves = state.get_possible_moves()
+        if self.stats is not None:
+            self.stats.nodes += 1
+            self.stats.expanded += 1
+            self.stats.generated_moves += len(moves)
+        if not moves:
+            # This player has no moves. So the previous player is the winner.
+            return INFINITY if state.curr_player != self.my_color else -INFINITY, None
+        if self.move_orderer is not None:
+            moves = self.move_orderer.order_moves(moves, 0, pv_move)
+        elif pv_move is not None:
+            pv_key = move_key(pv_move)
+            moves.sort(key=lambda move: move_key(move) != pv_key)
+
+        pool = self.search_pool
+        pool.shared_alpha.value = alpha
+        pool.stop.value = False
+
+        def submit(move):
+            child_state = copy.deepcopy(state)
+            child_state.perform_move(move)
+            return pool.submit(_search_root_move, pool.generation, self.utility, self.my_color,
+                               self.selective_deepening, self.batch_utility, self.tablebase, child_state, depth, beta,
+                               deadline, self.stats is not None, self.principal_variation, self.quiescence_plies)
+
+        # The first move is expected to be the best, so the others are searched with its value as alpha.
+        results = self._wait({submit(moves[0]): 0}, deadline)
+        if not self.aborted:
+            results.update(self._wait({submit(move): index for index, move in enumerate(moves[1:], 1)}, deadline))
+
+        best_index = None
+        best_value = -INFINITY
+        for index, (value, searched_alpha, aborted, nodes, stats) in sorted(results.items()):
+            self.nodes += nodes
+            if stats is not None:
+                # The plies of the workers start at the children of the root.
+                stats.max_ply += 1
+                self.stats.merge(stats)
+            if aborted:
+                self.aborted = True
+            elif value > searched_alpha and (best_index is None or value > best_value):
+                # The other values are upper bounds, no better than the alpha they were searched with.
+                best_index = index
+                best_value = value
+        if best_index is None:
+            # No move is better than the given alpha.
+            return alpha, moves[0]
+        return max(alpha, best_value), moves[best_index]
+
+    def _wait(self, futures, deadline=None):
+        """Waits for the given tasks, and stops them when there is no more time or the deadline passed.
+
+        :param futures: A dict of the form future:root move index. A future is None if the pool was shut down.
+        :param deadline: The time.monotonic() time of the search's deadline, or None.
+        :return: A dict of the form root move index:task result, without the tasks cancelled before they started.
+        """
+        pending = {future for future in futures if future is not None}
+        while pending:
+            _, pending = wait(pending, timeout=WAIT_INTERVAL, return_when=FIRST_COMPLETED)
+            if pending and (self.no_more_time() or (deadline is not None and time.monotonic() >= deadline)):
+                self.search_pool.stop.value = True
+                for future in pending:
+                    future.cancel()
+        results = {}
+        for future, index in futures.items():
+            if future is None or future.cancelled():
+                self.aborted = True
+            else:
+                results[index] = future.result()
+        return results
+
+
+def benchmark(player_name, max_workers, depth, num_positions=8, seed=0):
+    """Prints the nodes per second of the serial search and of the parallel search with 1 to max_workers workers,
+    over the same random positions, and their speedup over the serial search.
+    """
+    player_module = __import__('players.{}'.format(player_name), fromlist=['Player'])
+    from checkers.board import GameState
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < num_positions:
+        state = GameState()
+        for _ in range(rng.randrange(4, 30)):
+            moves = state.get_possible_moves()
+            if not moves:
+                break
+            state.perform_move(rng.choice(moves))
+        if state.get_possible_moves():
+            positions.append(state)
+
+    def run(minimax):
+        nodes = 0
+        start = time.perf_counter()
+        for state in positions:
+            player.curr_board = state.board
+            minimax.search(state, depth, -INFINITY, INFINITY, True)
+            nodes += minimax.nodes
+        return nodes / (time.perf_counter() - start)
+
+    player = player_module.Player(1, positions[0].curr_player, 1, 1)
+    no_more_time = lambda: False
+    serial_nps = run(MiniMaxWithAlphaBetaPruning(player.utility, player.color, no_more_time,
+                                                 player.selective_deepening_criterion))
+    print('workers  nodes/s  speedup')
+    print('serial {:9.0f}  {:7.2f}'.format(serial_nps, 1))
+    for workers in range(1, max_workers + 1):
+        search_pool = SearchPool(workers)
+        minimax = ParallelMiniMaxWithAlphaBetaPruning(player.utility, player.color, no_more_time,
+                                                      player.selective_deepening_criterion, search_pool)
+        # Starts the worker processes, so their startup is not measured.
+        minimax.search(positions[0], PARALLEL_MIN_DEPTH, -INFINITY, INFINITY, True)
+        nps = run(minimax)
+        search_pool.shutdown()
+        print('{:6d} {:9.0f}  {:7.2f}'.format(workers, nps, nps / serial_nps))
+
+
+if __name__ == '__main__':
+    benchmark(sys.argv[1] if len(sys.argv) > 1 else 'better_h_player',
+              int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count(),
+              int(sys.argv[3]) if len(sys.argv) > 3 else 5)
@@ -0,0 +1,225 @@
+"""Perft: counts the move sequences of a given length, to check and time the move generation.
+
+perft(state, depth) walks every sequence of depth moves from the state with GameState.get_possible_moves,
+perform_move and undo_move, and counts the leaf nodes, and the captures and promotions among the last moves.
+The counts from the opening position are checked against the known checkers perft numbers, and the counts from a
+set of stored positions (kings looping back to their square, long multi-jumps, promotions) against the numbers
+recorded when they were added, which were cross-checked with the original dict-based move generation.
+
+    python perft.py [depth] [--position NAME] [--divide]    # count and report nodes per second
+    python perft.py --check [--max-depth N]                 # the regression gate, fails on a wrong count
+"""
+import argparse
+import sys
+import time
+from collections import namedtuple
+from checkers.board import GameState
+from checkers.bitboard import locs_to_bitboard
+from checkers.consts import RED_PLAYER, BLACK_PLAYER, RP, RK, BP, BK, BACK_ROW, PAWN_COLOR
+
+PerftResult = namedtuple('PerftResult', ['nodes', 'captures', 'promotions'])
+
+# Known leaf counts from the opening position, by depth.
+OPENING_NODES = {
+    1: 7,
+    2: 49,
+    3: 302,
+    4: 1469,
+    5: 7361,
+    6: 36768,
+    7: 179740,
+    8: 845931,
+    9: 3963680,
+    10: 18391564,
+    11: 85242128,
+    12: 388623673,
+}
+
+# Stored positions: name -> (player to move, board rows from row 0, {depth: (nodes, captures, promotions)}).
+# A board row has one character per column: RP, RK, BP, BK, or '.' for an empty square.
+TEST_POSITIONS = {
+    'loop-back': (BLACK_PLAYER,
+                  ['..B.....',
+                   '.r......',
+                   '..r.r...',
+                   '........',
+                   'B.r.r.b.',
+                   '...B...b',
+                   'B.......',
+                   '...b....'],
+                  {1: (3, 3, 0),
+                   2: (6, 2, 0),
+                   3: (60, 4, 0),
+                   4: (90, 4, 0),
+                   5: (484, 64, 8),
+                   6: (764, 42, 4),
+                   7: (4346, 550, 88),
+                   8: (5968, 1032, 30),
+                   9: (35676, 4034, 1124)}),
+    'multi-jump': (RED_PLAYER,
+                   ['........',
+                    '.b.B....',
+                    '....r.R.',
+                    '.b...b.B',
+                    '........',
+                    '.b.b....',
+                    'r.......',
+                    '.b.....b'],
+                   {1: (3, 3, 0),
+                    2: (9, 3, 2),
+                    3: (32, 0, 1),
+                    4: (265, 3, 40),
+                    5: (931, 26, 53),
+                    6: (6806, 238, 839),
+                    7: (25552, 1224, 2130),
+                    8: (207251, 4752, 20292),
+                    9: (751743, 35820, 56960)}),
+    'promotions': (RED_PLAYER,
+                   ['........',
+                    '...r.b..',
+                    '....r...',
+                    '.r.b....',
+                    '......b.',
+                    '...r.r..',
+                    '..b...b.',
+                    '........'],
+                   {1: (3, 3, 2),
+                    2: (4, 4, 0),
+                    3: (4, 4, 2),
+                    4: (24, 0, 8),
+                    5: (156, 0, 0),
+                    6: (712, 30, 184),
+                    7: (4378, 92, 0),
+                    8: (18130, 1202, 3086),
+                    9: (107170, 2834, 2174)}),
+}
+
+
+def parse_position(curr_player, rows):
+    """The GameState of a stored position."""
+    tools = {tool: [] for tool in (RP, RK, BP, BK)}
+    for i, row in enumerate(rows):
+        for j, tool in enumerate(row):
+            if tool in tools:
+                tools[tool].append((i, j))
+    red = locs_to_bitboard(tools[RP] + tools[RK])
+    black = locs_to_bitboard(tools[BP] + tools[BK])
+    kings = locs_to_bitboard(tools[RK] + tools[BK])
+    return GameState.from_bitboards(red, black, kings, curr_player)
+
+
+def _is_promotion(state, move):
+    return move.player_type == PAWN_COLOR[state.curr_player] and move.target_loc[0] == BACK_ROW[state.curr_player]
+
+
+def perft(state, depth):
+    """Counts the move sequences of the given length from the state. The state is restored when it returns.
+
+    A sequence that ends early, because a player has no moves, is not counted.
+
+    :param depth: The length of the sequences, at least 1.
+    :return: A PerftResult: the leaf nodes, and the captures and promotions among the last moves.
+    """
+    if depth < 1:
+        raise ValueError('The perft depth must be at least 1, got {}'.format(depth))
+    moves = state.get_possible_moves()
+    if depth == 1:
+        # The last moves are counted without performing them.
+        return PerftResult(len(moves), sum(1 for move in moves if move.jumped_locs),
+                           sum(1 for move in moves if _is_promotion(state, move)))
+    nodes = captures = promotions = 0
+    for move in moves:
+        undo = state.perform_move(move)
+        result = perft(state, depth - 1)
+        state.undo_move(move, undo)
+        nodes += result.nodes
+        captures += result.captures
+        promotions += result.promotions
+    return PerftResult(nodes, captures, promotions)
+
+
+def divide(state, depth):
+    """Perft per root move.
+
+    :param depth: The length of the sequences, at least 1.
+    :return: A list of (move, PerftResult) pairs, in the order of get_possible_moves.
+    """
+    if depth < 1:
+        raise ValueError('The perft depth must be at least 1, got {}'.format(depth))
+    results = []
+    for move in state.get_possible_moves():
+        if depth == 1:
+            results.append((move, PerftResult(1, int(bool(move.jumped_locs)), int(_is_promotion(state, move)))))
+            continue
+        undo = state.perform_move(move)
+        results.append((move, perft(state, depth - 1)))
+        state.undo_move(move, undo)
+    return results
+
+
+def timed_perft(state, depth):
+    """Runs perft and prints its counts and nodes per second.
+
+    :return: The PerftResult.
+    """
+    start = time.perf_counter()
+    result = perft(state, depth)
+    elapsed = time.perf_counter() - start
+    print('depth {:2d}: {:>12d} nodes {:>10d} captures {:>8d} promotions {:8.2f} s {:>10.0f} nodes/s'.format(
+        depth, result.nodes, result.captures, result.promotions, elapsed, result.nodes / elapsed if elapsed else 0))
+    return result
+
+
+def check(max_depth):
+    """Checks the counts of the opening position and of the stored positions up to max_depth.
+
+    :return: True if all of them are right.
+    """
+    ok = True
+    print('opening position')
+    for depth in range(1, max_depth + 1):
+        if depth not in OPENING_NODES:
+            break
+        result = timed_perft(GameState(), depth)
+        if result.nodes != OPENING_NODES[depth]:
+            print('  WRONG: expected {} nodes'.format(OPENING_NODES[depth]))
+            ok = False
+    for name, (curr_player, rows, expected) in TEST_POSITIONS.items():
+        print(name)
+        for depth, counts in sorted(expected.items()):
+            if depth > max_depth:
+                break
+            result = timed_perft(parse_position(curr_player, rows), depth)
+            if result != PerftResult(*counts):
+                print('  WRONG: expected {}'.format(PerftResult(*counts)))
+                ok = False
+    return ok
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Counts move sequences to check and time the move generation.')
+    parser.add_argument('depth', type=int, nargs='?', default=8, help='The length of the counted sequences.')
+    parser.add_argument('--position', choices=sorted(TEST_POSITIONS), default=None,
+                        help='A stored position to start from instead of the opening one.')
+    parser.add_argument('--divide', action='store_true', help='Break the counts down per root move.')
+    parser.add_argument('--check', action='store_true',
+                        help='Check the opening position and the stored positions against the expected counts.')
+    parser.add_argument('--max-depth', type=int, default=8, help='The deepest depth --check runs.')
+    args = parser.parse_args()
+
+    if args.check:
+        sys.exit(0 if check(args.max_depth) else 1)
+
+    if args.position is None:
+        start_state = GameState()
+    else:
+        start_state = parse_position(*TEST_POSITIONS[args.position][:2])
+    if args.divide:
+        total = PerftResult(0, 0, 0)
+        for root_move, move_result in divide(start_state, args.depth):
+            print('{}: {} nodes, {} captures, {} promotions'.format(root_move, *move_result))
+            total = PerftResult(*(a + b for a, b in zip(total, move_result)))
+        print('total: {} nodes, {} captures, {} promotions'.format(*total))
+    else:
+        for d in range(1, args.depth + 1):
+            timed_perft(start_state, d)
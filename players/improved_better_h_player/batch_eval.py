@@ -0,0 +1,149 @@
+"""
+Vectorized (NumPy) evaluation of many states at once, for the search's batched leaf evaluation.
+
+Boards are encoded as an (N, 32) int8 array indexed by square number (see SQUARE_LOCS), holding 1 for RP, 2 for RK,
+-1 for BP, -2 for BK and 0 for an empty square. The features mirror BetterHPlayer.sum_util and BetterHPlayer.utility,
+and are computed with the same float operations, so the results are equal to the scalar ones bit for bit.
+"""
+
+# ===============================================================================
+# Imports
+# ===============================================================================
+
+import numpy as np
+from checkers.consts import RED_PLAYER, BLACK_PLAYER, OPPONENT_COLOR, MAX_TURNS_NO_JUMP, LOC_SQUARES, NUM_SQUARES
+from checkers.moves import PAWN_SQUARE_CAPTURE_THREATS, KING_SQUARE_CAPTURE_THREATS
+from utils import INFINITY
+from better_h_evaluation import CENTER_LOCS, BACK_LINE_LOCS
+
+# ===============================================================================
+# Globals
+# ===============================================================================
+
+# The sign of each player's tools in the encoding. A pawn is the sign, a king is twice the sign.
+COLOR_SIGN = {
+    RED_PLAYER: 1,
+    BLACK_PLAYER: -1,
+}
+
+# Column NUM_SQUARES of a padded board stands for every location outside the board.
+OFF_BOARD = NUM_SQUARES
+
+CENTER_SQUARES = np.array([LOC_SQUARES[loc] for loc in CENTER_LOCS])
+BACK_LINE_SQUARES = {color: np.array([LOC_SQUARES[loc] for loc in locs]) for color, locs in BACK_LINE_LOCS.items()}
+
+SQUARE_BITS = np.arange(NUM_SQUARES, dtype=np.int64)
+
+
+def _attack_checks(color):
+    """The jumps over each square that can capture a tool of the given color, from checkers.moves.
+
+    :return: A list of (attacker squares, landing squares, pawns attack) tuples, one per jump direction. The arrays
+        are indexed by the attacked square. Squares with no jump in a direction hold OFF_BOARD, and pawns attack is
+        True where an opponent pawn (and not only a king) can make the jump.
+    """
+    slots = max(len(threats) for threats in KING_SQUARE_CAPTURE_THREATS)
+    attackers = np.full((slots, NUM_SQUARES), OFF_BOARD)
+    landings = np.full((slots, NUM_SQUARES), OFF_BOARD)
+    pawns_attack = np.zeros((slots, NUM_SQUARES), dtype=bool)
+    for sq, threats in enumerate(KING_SQUARE_CAPTURE_THREATS):
+        for slot, (attacker, target) in enumerate(threats):
+            attackers[slot, sq] = attacker
+            landings[slot, sq] = target
+            pawns_attack[slot, sq] = (attacker, target) in PAWN_SQUARE_CAPTURE_THREATS[color][sq]
+    return list(zip(attackers, landings, pawns_attack))
+
+
+ATTACK_CHECKS = {color: _attack_checks(color) for color in (RED_PLAYER, BLACK_PLAYER)}
+
+
+# ===============================================================================
+# Functions
+# ===============================================================================
+
+def encode_states(states):
+    """Encodes the boards of the given states.
+
+    :param states: A sequence of GameState objects.
+    :return: An (N, 32) int8 array.
+    """
+    count = len(states)
+    red = np.fromiter((state.red for state in states), dtype=np.int64, count=count)
+    black = np.fromiter((state.black for state in states), dtype=np.int64, count=count)
+    kings = np.fromiter((state.kings for state in states), dtype=np.int64, count=count)
+    return encode_bitboards(red, black, kings)
+
+
+def encode_bitboards(red, black, kings):
+    """Encodes boards given as arrays of the bitboards of GameState (see checkers.bitboard).
+
+    :return: An (N, 32) int8 array.
+    """
+    red = red.astype(np.int64)
+    black = black.astype(np.int64)
+    kings = kings.astype(np.int64)
+    red_bits = (red[:, None] >> SQUARE_BITS) & 1
+    black_bits = (black[:, None] >> SQUARE_BITS) & 1
+    king_bits = (kings[:, None] >> SQUARE_BITS) & 1
+    return ((red_bits - black_bits) * (1 + king_bits)).astype(np.int8)
+
+
+def attacked(boards, color):
+    """Vectorized GameState.attacked_tools.
+
+    :param boards: An (N, 32) encoded boards array.
+    :param color: The color of the attacked tools.
+    :return: An (N, 32) bool array, True where a tool of the given color is attacked.
+    """
+    sign = COLOR_SIGN[color]
+    # The extra column is empty, and only ever read for a missing jump, whose attacker is missing too.
+    padded = np.concatenate([boards, np.zeros((len(boards), 1), dtype=boards.dtype)], axis=1)
+    result = np.zeros(boards.shape, dtype=bool)
+    for attackers, landings, pawns_attack in ATTACK_CHECKS[color]:
+        attacker_vals = padded[:, attackers]
+        has_attacker = (attacker_vals == -2 * sign) | (pawns_attack & (attacker_vals == -sign))
+        result |= has_attacker & (padded[:, landings] == 0)
+    return result & (boards * sign > 0)
+
+
+def sum_util(boards, color, weights):
+    """Vectorized Player.sum_util.
+
+    :param weights: The weights of the evaluation, as returned by load_weights.
+    :return: A float64 array of the heuristic sum of the tools of the given color on each board.
+    """
+    sign = COLOR_SIGN[color]
+    tools = boards * sign > 0
+    pawns = boards == sign
+    h_sum = weights['CENTER'] * tools[:, CENTER_SQUARES].sum(axis=1)
+    h_sum = h_sum + weights['BACK_LINE'] * pawns[:, BACK_LINE_SQUARES[color]].sum(axis=1)
+    return h_sum + weights['ATTACKED'] * attacked(boards, color).sum(axis=1)
+
+
+def utility(states, color, weights):
+    """Vectorized Player.utility, without the only kings term.
+
+    :param states: A sequence of GameState objects with possible moves.
+    :param color: The color of the evaluating player.
+    :param weights: The weights of the evaluation, as returned by load_weights.
+    :return: A tuple: (float64 array of the utilities, bool array marking the states in which the only kings term
+        applies, whose utilities must be computed by Player.utility instead)
+    """
+    boards = encode_states(states)
+    opponent_color = OPPONENT_COLOR[color]
+    sign = COLOR_SIGN[color]
+    my_pawns = (boards == sign).sum(axis=1)
+    my_kings = (boards == 2 * sign).sum(axis=1)
+    op_pawns = (boards == -sign).sum(axis=1)
+    op_kings = (boards == -2 * sign).sum(axis=1)
+
+    pawn_weight = weights['PAWN_WEIGHT']
+    king_weight = weights['KING_WEIGHT']
+    my_u = (pawn_weight * my_pawns) + (king_weight * my_kings) + sum_util(boards, color, weights)
+    op_u = (pawn_weight * op_pawns) + (king_weight * op_kings) + sum_util(boards, opponent_color, weights)
+    values = np.where(my_u == 0, -INFINITY, np.where(op_u == 0, INFINITY, my_u - op_u))
+
+    turns = np.fromiter((state.turns_since_last_jump for state in states), dtype=np.float64, count=len(states))
+    values[turns >= MAX_TURNS_NO_JUMP] = 0
+    only_kings = (my_pawns < my_kings) & (op_pawns < op_kings) & (turns < MAX_TURNS_NO_JUMP)
+    return values, only_kings
@@ -3,10 +3,9 @@
 # ===============================================================================
 
 import abstract
-from utils import MiniMaxWithAlphaBetaPruning, INFINITY, run_with_limited_time, ExceededTimeError
-from checkers.consts import EM, PAWN_COLOR, KING_COLOR, OPPONENT_COLOR, MAX_TURNS_NO_JUMP
-import time
-from collections import defaultdict
+import search_player
+from utils import INFINITY
+from checkers.consts import PAWN_COLOR, KING_COLOR, OPPONENT_COLOR, MAX_TURNS_NO_JUMP
 
 # ===============================================================================
 # Globals
@@ -20,102 +19,40 @@ KING_WEIGHT = 1.5
 # Player
 # ===============================================================================
 
-class Player(abstract.AbstractPlayer):
-
-    def __init__(self, setup_time, player_color, time_per_k_turns, k):
-        abstract.AbstractPlayer.__init__(self, setup_time, player_color, time_per_k_turns, k)
-        self.clock = time.process_time()
-
-        # We are simply providing (remaining time / remaining turns) for each turn in round.
-        # Taking a spare time of 0.05 seconds.
-        self.turns_remaining_in_round = self.k
-        self.time_remaining_in_round = self.time_per_k_turns
+class Player(search_player.SearchPlayer):
+
+    def __init__(self, setup_time, player_color, time_per_k_turns, k, transposition_table_mb=0,
+                 move_ordering=False, search_workers=1, tablebase_path=None,
+                 opening_book_path=None, stats_path=None, ponder=False,
+                 principal_variation=False, quiescence_plies=0, evaluation_cache_entries=0):
+        search_player.SearchPlayer.__init__(self, setup_time, player_color, time_per_k_turns, k,
+                                            transposition_table_mb=transposition_table_mb, move_ordering=move_ordering,
+                                            search_workers=search_workers, tablebase_path=tablebase_path,
+                                            opening_book_path=opening_book_path, stats_path=stats_path, ponder=ponder,
+                                            principal_variation=principal_variation, quiescence_plies=quiescence_plies,
+                                            evaluation_cache_entries=evaluation_cache_entries)
         # Percents for splitting the time for each depth
         self.split_time_array = [0.05, 0.1, 0.15, 0.19, 0.25, 0.26]
-        self.time_for_current_move = self.time_remaining_in_round / self.turns_remaining_in_round - 0.05
-
-    def get_move(self, game_state, possible_moves):
-        self.clock = time.process_time()
-        self.time_for_current_move = self.time_remaining_in_round / self.turns_remaining_in_round - 0.05
-        if len(possible_moves) == 1:
-            return possible_moves[0]
-
-        current_depth = 1
-        prev_alpha = -INFINITY
-
-        # Choosing an arbitrary move in case Minimax does not return an answer:
-        best_move = possible_moves[0]
-
-        # Initialize Minimax algorithm, still not running anything
-        minimax = MiniMaxWithAlphaBetaPruning(self.utility, self.color, self.no_more_time,
-                                              self.selective_deepening_criterion)
-
-        # Iterative deepening until the time runs out.
-        while True:
-            time_for_current_depth: float
-            print('going to depth: {}, remaining time: {}, prev_alpha: {}, best_move: {}'.format(
-                current_depth,
-                current_depth,
-                self.time_for_current_move - (time.process_time() - self.clock),
-                prev_alpha,
-                best_move))
-            # The array is init for 6 depth (the average depth) if he succeeded more than that give the remain time
-            if current_depth - 1 > 5:
-                time_for_current_depth = self.time_for_current_move - (time.process_time() - self.clock)
-            else:
-                # Deeper in the tree get more time (see array values)
-                time_for_current_depth = self.time_for_current_move * self.split_time_array[current_depth - 1]
-            try:
-                (alpha, move), run_time = run_with_limited_time(
-                    minimax.search, (game_state, current_depth, -INFINITY, INFINITY, True), {},
-                    time_for_current_depth)
-            except (ExceededTimeError, MemoryError):
-                print('no more time, achieved depth {}'.format(current_depth))
-                break
-
-            if self.no_more_time():
-                print('no more time')
-                break
 
-            prev_alpha = alpha
-            best_move = move
-
-            if alpha == INFINITY:
-                print('the move: {} will guarantee victory.'.format(best_move))
-                break
-
-            if alpha == -INFINITY:
-                print('all is lost')
-                break
-
-            current_depth += 1
-
-        if self.turns_remaining_in_round == 1:
-            self.turns_remaining_in_round = self.k
-            self.time_remaining_in_round = self.time_per_k_turns
-        else:
-            self.turns_remaining_in_round -= 1
-            self.time_remaining_in_round -= (time.process_time() - self.clock)
-        return best_move
+    def iteration_time(self, depth):
+        # The array is init for 6 depth (the average depth) if he succeeded more than that give the remain time
+        if depth - 1 > 5:
+            return search_player.SearchPlayer.iteration_time(self, depth)
+        # Deeper in the tree get more time (see array values)
+        return self.time_for_current_move * self.split_time_array[depth - 1]
 
     def utility(self, state):
-        if len(state.get_possible_moves()) == 0:
-            return INFINITY if state.curr_player != self.color else -INFINITY
+        # A state without possible moves never gets here: the search scores it as a win or a loss.
         if state.turns_since_last_jump >= MAX_TURNS_NO_JUMP:
             return 0
 
-        # Count how many red and black pawn
-        piece_counts = defaultdict(lambda: 0)
-        for loc_val in state.board.values():
-            if loc_val != EM:
-                piece_counts[loc_val] += 1
-
         opponent_color = OPPONENT_COLOR[self.color]
 
-        my_u = ((PAWN_WEIGHT * piece_counts[PAWN_COLOR[self.color]]) +
-                (KING_WEIGHT * piece_counts[KING_COLOR[self.color]]))
-        op_u = ((PAWN_WEIGHT * piece_counts[PAWN_COLOR[opponent_color]]) +
-                (KING_WEIGHT * piece_counts[KING_COLOR[opponent_color]]))
+        # The state counts the tools of each type in constant time
+        my_u = ((PAWN_WEIGHT * state.tool_count(PAWN_COLOR[self.color])) +
+                (KING_WEIGHT * state.tool_count(KING_COLOR[self.color])))
+        op_u = ((PAWN_WEIGHT * state.tool_count(PAWN_COLOR[opponent_color])) +
+                (KING_WEIGHT * state.tool_count(KING_COLOR[opponent_color])))
         if my_u == 0:
             # I have no tools left
             return -INFINITY
@@ -129,9 +66,6 @@ class Player(abstract.AbstractPlayer):
         # improve player does not selectively deepen into certain nodes.
         return False
 
-    def no_more_time(self):
-        return (time.process_time() - self.clock) >= self.time_for_current_move
-
     def __repr__(self):
         return '{} {}'.format(abstract.AbstractPlayer.__repr__(self), 'improved_player')
 
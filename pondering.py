@@ -0,0 +1,152 @@
+"""Pondering: searching on the opponent's time.
+
+After a player returns its move, a Ponderer searches every reply the opponent may play in a background process,
+one iterative deepening depth at a time over all of the replies, until the player's next get_move stops it. If the
+reply that was actually played was searched, get_move goes on from the depth the pondering completed, with its best
+move searched first.
+
+The search runs in a process of its own, rather than in a thread, because both the game runner and the players
+measure time with time.process_time, which counts the CPU time of every thread of their process. The CPU time of
+the ponder process is not charged to the player. On a machine with fewer cores than searching processes, it does
+slow down the opponent's searches, which are cut by deadlines on the wall clock.
+"""
+import copy
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from utils import MiniMaxWithAlphaBetaPruning, INFINITY
+from transposition import TranspositionTable
+from move_ordering import MoveOrderer, move_key
+
+# The deepest iteration of the pondering. It only stops earlier when it is stopped, or when every reply is solved.
+MAX_PONDER_DEPTH = 64
+
+# The state of the ponder process, set by _init_worker.
+_worker = {}
+
+
+def _init_worker(stop, transposition_table_mb, move_ordering):
+    _worker['stop'] = stop
+    _worker['transposition_table'] = TranspositionTable(transposition_table_mb) if transposition_table_mb else None
+    _worker['move_orderer'] = MoveOrderer() if move_ordering else None
+
+
+def _ponder(utility, my_color, selective_deepening, batch_utility, tablebase, quiescence_plies, state):
+    """Searches the positions after every possible reply of the opponent. Runs in the ponder process.
+
+    :param state: The state after the player's move, the opponent to move.
+    :return: A dict of the form Zobrist key:(depth, value, best move key), for the positions after the replies, with
+             the deepest iteration that was searched to the end.
+    """
+    stop = _worker['stop']
+    transposition_table = _worker['transposition_table']
+    move_orderer = _worker['move_orderer']
+    if transposition_table is not None:
+        transposition_table.new_search()
+    if move_orderer is not None:
+        move_orderer.new_search()
+    minimax = MiniMaxWithAlphaBetaPruning(utility, my_color, lambda: stop.value, selective_deepening,
+                                          transposition_table=transposition_table, move_orderer=move_orderer,
+                                          batch_utility=batch_utility, tablebase=tablebase,
+                                          quiescence_plies=quiescence_plies)
+
+    children = []
+    for reply in state.get_possible_moves():
+        child = copy.deepcopy(state)
+        child.perform_move(reply)
+        if child.has_any_move():
+            children.append(child)
+
+    results = {}
+    for depth in range(1, MAX_PONDER_DEPTH + 1):
+        unsolved = []
+        for child in children:
+            pv_move = None
+            if child.zobrist_key in results:
+                pv_move = _find_move(child.get_possible_moves(), results[child.zobrist_key][2])
+            value, move = minimax.search(child, depth, -INFINITY, INFINITY, True, pv_move)
+            if minimax.aborted:
+                return results
+            results[child.zobrist_key] = (depth, value, move_key(move))
+            if abs(value) != INFINITY:
+                unsolved.append(child)
+        children = unsolved
+        if not children:
+            break
+    return results
+
+
+def _find_move(moves, key):
+    """The move with the given move_key, or None."""
+    for move in moves:
+        if move_key(move) == key:
+            return move
+    return None
+
+
+class Ponderer:
+    def __init__(self, transposition_table_mb=0, move_ordering=False):
+        """The ponder process of a player. A player creates one for the whole game, and shuts it down at its end.
+
+        :param transposition_table_mb: The size of the transposition table of the ponder process, 0 turns it off.
+        :param move_ordering: Whether the ponder process orders its moves with a MoveOrderer.
+        """
+        # The players are created and run in threads, which do not mix well with fork.
+        context = multiprocessing.get_context('spawn')
+        self.stop_flag = context.Value('b', False)
+        self.executor = ProcessPoolExecutor(1, mp_context=context, initializer=_init_worker,
+                                            initargs=(self.stop_flag, transposition_table_mb, move_ordering))
+        self.future = None
+        self.hits = 0
+        self.probes = 0
+
+    def start(self, state, move, utility, my_color, selective_deepening, batch_utility=None, tablebase=None,
+              quiescence_plies=0):
+        """Starts pondering over the replies to a move. Returns at once.
+
+        The functions are pickled, so they should be methods of a player that pickles its evaluation state only
+        (see SearchPlayer.__getstate__), and the evaluation state should already be the one of the next move.
+
+        :param state: The state the move is played in. It is not changed.
+        :param move: The move the player returned.
+        The other parameters are the ones of MiniMaxWithAlphaBetaPruning.
+        """
+        self.stop()
+        next_state = copy.deepcopy(state)
+        next_state.perform_move(move)
+        self.stop_flag.value = False
+        self.future = self.executor.submit(_ponder, utility, my_color, selective_deepening, batch_utility,
+                                           tablebase, quiescence_plies, next_state)
+
+    def stop(self):
+        """Stops the pondering, and waits for the ponder process to return.
+
+        :return: The results of _ponder, or an empty dict if nothing was pondered.
+        """
+        if self.future is None:
+            return {}
+        self.stop_flag.value = True
+        results = self.future.result()
+        self.future = None
+        return results
+
+    def answer(self, state, possible_moves):
+        """Stops the pondering, and looks the state the opponent's reply led to up in its results.
+
+        :return: A tuple: (The depth searched to the end, Its value, Its best move, one of possible_moves), or None
+                 if the state was not pondered.
+        """
+        results = self.stop()
+        self.probes += 1
+        result = results.get(state.zobrist_key)
+        if result is None:
+            return None
+        depth, value, key = result
+        move = _find_move(possible_moves, key)
+        if move is None:
+            return None
+        self.hits += 1
+        return depth, value, move
+
+    def shutdown(self):
+        self.stop()
+        self.executor.shutdown()
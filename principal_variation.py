@@ -0,0 +1,145 @@
+"""Principal variation search and aspiration windows.
+
+PrincipalVariationSearch expects the first move of every node to be the best one, as it usually is with a
+transposition table and a move orderer. It searches the first move with the node's window, and only tests the
+others with a null window: whether they are better than the best value so far. A move that passes the test is
+searched again with the full window.
+
+aspiration_search searches the root with a narrow window around the value of the previous iteration, and searches
+again with the failing side opened when the value falls outside of it.
+
+Running this module compares the nodes the engines search to reach each depth of the iterative deepening:
+    python principal_variation.py [player] [depth] [--no-move-ordering]
+"""
+import math
+import random
+import sys
+from utils import MiniMaxWithAlphaBetaPruning, INFINITY
+from transposition import TranspositionTable
+from move_ordering import MoveOrderer
+
+# Half the width of the aspiration window around the value of the previous iteration.
+ASPIRATION_WINDOW = 1.0
+
+
+class PrincipalVariationSearch(MiniMaxWithAlphaBetaPruning):
+    """A MiniMaxWithAlphaBetaPruning that searches the moves after the first one of every node with a null window,
+    and again with the node's window when they turn out to be better. The parameters and the results are the ones
+    of MiniMaxWithAlphaBetaPruning; a SearchStats also counts the searches done again.
+    """
+
+    def _search_child(self, state, move, move_index, depth, alpha, beta, maximizing_player, ply):
+        if move_index == 0 or depth <= 1:
+            # The null window only narrows the bound that the child's own children are cut by, which leaves cannot
+            # use, so near the leaves a search done again would be all waste.
+            return MiniMaxWithAlphaBetaPruning._search_child(self, state, move, move_index, depth, alpha, beta,
+                                                             maximizing_player, ply)
+        if maximizing_player:
+            # The node is a min node: does the move lead below beta?
+            null_alpha, null_beta = math.nextafter(beta, -INFINITY), beta
+        else:
+            # The node is a max node: does the move lead above alpha?
+            null_alpha, null_beta = alpha, math.nextafter(alpha, INFINITY)
+        value = MiniMaxWithAlphaBetaPruning._search_child(self, state, move, move_index, depth, null_alpha,
+                                                          null_beta, maximizing_player, ply)
+        if self.aborted or not alpha < value < beta:
+            return value
+        if self.stats is not None:
+            self.stats.researches += 1
+        return MiniMaxWithAlphaBetaPruning._search_child(self, state, move, move_index, depth, alpha, beta,
+                                                         maximizing_player, ply)
+
+
+def aspiration_search(minimax, state, depth, guess, pv_move=None, deadline=None, window=ASPIRATION_WINDOW):
+    """Searches a max root with a window of the given half width around a guess of its value, and again with the
+    failing side opened to INFINITY when the value falls outside of it.
+
+    :param minimax: A MiniMaxWithAlphaBetaPruning, or anything with its search method, nodes and aborted.
+    :param guess: The expected value, usually the one of the previous iteration. Without a finite guess the
+                  window is the full one.
+    The other parameters are the ones of MiniMaxWithAlphaBetaPruning.search. Afterwards, minimax.nodes counts the
+    nodes of all the searches.
+    :return: The result of the last search.
+    """
+    if guess is None or abs(guess) >= INFINITY:
+        return minimax.search(state, depth, -INFINITY, INFINITY, True, pv_move, deadline=deadline)
+    alpha = max(guess - window, -INFINITY)
+    beta = min(guess + window, INFINITY)
+    nodes = 0
+    while True:
+        value, move = minimax.search(state, depth, alpha, beta, True, pv_move, deadline=deadline)
+        nodes += minimax.nodes
+        if minimax.aborted:
+            break
+        if value <= alpha and alpha > -INFINITY:
+            alpha = -INFINITY
+        elif value >= beta and beta < INFINITY:
+            beta = INFINITY
+        else:
+            break
+        # The best move of the failed search is the best one found so far, so it is searched first again.
+        pv_move = move if move is not None else pv_move
+    minimax.nodes = nodes
+    return value, move
+
+
+def benchmark(player_name, depth, move_ordering=True, num_positions=12, seed=0):
+    """Prints the nodes the iterative deepening of the alpha-beta search, and of the principal variation search
+    with and without aspiration windows, need to reach every depth over the same random positions. All of them use
+    a transposition table.
+
+    :param move_ordering: Whether they also use a MoveOrderer. Without it only the hash move is searched first.
+    """
+    player_module = __import__('players.{}'.format(player_name), fromlist=['Player'])
+    from checkers.board import GameState
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < num_positions:
+        state = GameState()
+        for _ in range(rng.randrange(4, 30)):
+            moves = state.get_possible_moves()
+            if not moves:
+                break
+            state.perform_move(rng.choice(moves))
+        if len(state.get_possible_moves()) > 1:
+            positions.append(state)
+
+    def run(engine, aspiration):
+        nodes = [0] * depth
+        values = []
+        for state in positions:
+            player = player_module.Player(1, state.curr_player, 1, 1)
+            player.curr_board = state.board
+            minimax = engine(player.utility, player.color, lambda: False, player.selective_deepening_criterion,
+                             transposition_table=TranspositionTable(16),
+                             move_orderer=MoveOrderer() if move_ordering else None)
+            value = None
+            best_move = None
+            for current_depth in range(1, depth + 1):
+                if aspiration:
+                    value, best_move = aspiration_search(minimax, state, current_depth, value, best_move)
+                else:
+                    value, best_move = minimax.search(state, current_depth, -INFINITY, INFINITY, True, best_move)
+                nodes[current_depth - 1] += minimax.nodes
+            values.append(value)
+        return nodes, values
+
+    alpha_beta_nodes, alpha_beta_values = run(MiniMaxWithAlphaBetaPruning, False)
+    pvs_nodes, pvs_values = run(PrincipalVariationSearch, False)
+    aspiration_nodes, aspiration_values = run(PrincipalVariationSearch, True)
+    print('depth  alpha-beta         pvs  pvs+aspiration  (cumulative nodes, {} positions)'.format(len(positions)))
+    totals = [0, 0, 0]
+    for d in range(depth):
+        for i, nodes in enumerate((alpha_beta_nodes, pvs_nodes, aspiration_nodes)):
+            totals[i] += nodes[d]
+        print('{:5d} {:11d} {:11d} {:15d}  {:6.1%} {:6.1%}'.format(d + 1, *totals, 1 - totals[1] / totals[0],
+                                                                 1 - totals[2] / totals[0]))
+    differing = sum(1 for a, b, c in zip(alpha_beta_values, pvs_values, aspiration_values) if not a == b == c)
+    print('positions with a different root value: {}'.format(differing))
+
+
+if __name__ == '__main__':
+    args = [arg for arg in sys.argv[1:] if arg != '--no-move-ordering']
+    benchmark(args[0] if len(args) > 0 else 'better_h_player',
+              int(args[1]) if len(args) > 1 else 7,
+              move_ordering='--no-move-ordering' not in sys.argv)
@@ -1,6 +1,7 @@
 """
 A generic turn-based game runner.
 """
+import ast
 import sys
 from checkers.board import GameState
 from checkers.consts import RED_PLAYER, BLACK_PLAYER, TIE, OPPONENT_COLOR, MAX_TURNS_NO_JUMP
@@ -9,6 +10,28 @@ import copy
 import players.interactive
 
 
+def parse_player(player):
+    """Splits a player argument into its module name and the options passed to its Player.
+
+    The argument is the module name, optionally followed by a colon and comma separated name=value options,
+    e.g. "better_h_player:transposition_table_mb=64,ponder=True,weights_path=w.json". A value is read as a Python
+    literal (a number, True, False or None) when it is one, and as a string otherwise.
+
+    :return: A tuple: (The module name, The dict of the options)
+    """
+    name, _, options_text = player.partition(':')
+    options = {}
+    for option in filter(None, options_text.split(',')):
+        key, separator, value = option.partition('=')
+        if not separator:
+            raise ValueError('A player option must be of the form name=value: {}'.format(option))
+        try:
+            options[key.strip()] = ast.literal_eval(value.strip())
+        except (ValueError, SyntaxError):
+            options[key.strip()] = value.strip()
+    return name, options
+
+
 class GameRunner:
     def __init__(self, setup_time, time_per_k_turns, k, verbose, red_player, black_player):
         """Game runner initialization.
@@ -19,7 +42,8 @@ class GameRunner:
         :param k: The k turns we measure time on. Must be a positive integer.
         :param verbose: preference of printing the board each turn. 'y' - yes, print. 'n' - no,  don't print.
         :param red_player: The name of the module containing the red player. E.g. "myplayer" will invoke an
-            equivalent to "import players.myplayer" in the code.
+            equivalent to "import players.myplayer" in the code. It may be followed by options for the player, e.g.
+            "myplayer:transposition_table_mb=64,ponder=True" (see parse_player).
         :param black_player: Same as 'red_player' parameter, but for the black one.
         """
 
@@ -30,8 +54,11 @@ class GameRunner:
         self.players = {}
 
         # Dynamically importing the players. This allows maximum flexibility and modularity.
+        red_player, red_options = parse_player(red_player)
+        black_player, black_options = parse_player(black_player)
         self.red_player = 'players.{}'.format(red_player)
         self.black_player = 'players.{}'.format(black_player)
+        self.player_options = {RED_PLAYER: red_options, BLACK_PLAYER: black_options}
         __import__(self.red_player)
         __import__(self.black_player)
         red_is_interactive = sys.modules[self.red_player].Player == players.interactive.Player
@@ -51,7 +78,8 @@ class GameRunner:
         """
         try:
             player, measured_time = utils.run_with_limited_time(
-                player_class, (self.setup_time, player_color, self.time_per_k_turns, self.k), {}, self.setup_time*1.5)
+                player_class, (self.setup_time, player_color, self.time_per_k_turns, self.k),
+                self.player_options[player_color], self.setup_time*1.5)
         except MemoryError:
             return True
 
@@ -115,6 +143,8 @@ class GameRunner:
                     # K rounds completed. Resetting timers.
                     remaining_run_times = copy.deepcopy(self.player_move_times)
 
+        for player in self.players.values():
+            player.game_over()
         self.end_game(winner)
         return winner
 
@@ -152,5 +182,6 @@ if __name__ == '__main__':
     except TypeError:
         print("""Syntax: {0} setup_time time_per_k_turns k verbose red_player black_player
 For example: {0} 2 10 5 y interactive random_player
+Options can be passed to a player, e.g. better_h_player:transposition_table_mb=64,ponder=True
 Please read the docs in the code for more info.""".
               format(sys.argv[0]))
@@ -0,0 +1,250 @@
+"""The base class of the alpha-beta players: iterative deepening within the time of the move, with the search
+features that the player's options turn on.
+
+A player inherits from SearchPlayer and defines utility and selective_deepening_criterion. It may also override
+iteration_time, to split the time of the move between the iterations, end_move, to update its evaluation state once
+a move is chosen, and evaluation_key, if its utility depends on more than the position.
+"""
+import time
+import abstract
+from utils import MiniMaxWithAlphaBetaPruning, INFINITY
+from transposition import TranspositionTable
+from move_ordering import MoveOrderer
+from parallel_search import SearchPool, ParallelMiniMaxWithAlphaBetaPruning
+from tablebase import Tablebase
+from opening_book import OpeningBook
+from search_stats import SearchStats
+from pondering import Ponderer
+from principal_variation import PrincipalVariationSearch, aspiration_search
+from eval_cache import EvaluationCache
+from checkers.consts import MAX_TURNS_NO_JUMP
+
+
+class SearchPlayer(abstract.AbstractPlayer):
+    def __init__(self, setup_time, player_color, time_per_k_turns, k, transposition_table_mb=0,
+                 move_ordering=False, search_workers=1, tablebase_path=None,
+                 opening_book_path=None, stats_path=None, ponder=False,
+                 principal_variation=False, quiescence_plies=0, evaluation_cache_entries=0,
+                 batch_evaluation=False):
+        abstract.AbstractPlayer.__init__(self, setup_time, player_color, time_per_k_turns, k)
+        # The transposition table is kept for the whole game. Its size is given in megabytes, 0 turns it off.
+        self.transposition_table = TranspositionTable(transposition_table_mb) if transposition_table_mb else None
+        # Killer and history tables are also kept for the whole game.
+        self.move_orderer = MoveOrderer() if move_ordering else None
+        # Worker processes that the root moves are split between, also kept for the whole game. 1 searches here.
+        self.search_pool = SearchPool(search_workers, transposition_table_mb, move_ordering) if search_workers > 1 \
+            else None
+        # Exact values of the endgame positions, from a file written by tablebase.py. None turns it off.
+        self.tablebase = Tablebase(tablebase_path) if tablebase_path else None
+        # Moves for the opening positions, from a file written by opening_book.py. It is memory mapped, so opening
+        # it takes little of the setup time. None turns it off.
+        self.opening_book = OpeningBook(opening_book_path) if opening_book_path else None
+        # Search statistics of every searched move, appended to a JSON lines file (see search_stats.py). None turns
+        # them off.
+        self.stats_path = stats_path
+        self.search_stats = SearchStats() if stats_path else None
+        # Searches the opponent's replies in a background process while the opponent thinks, also kept for the
+        # whole game.
+        self.ponderer = Ponderer(transposition_table_mb, move_ordering) if ponder else None
+        # Search with PVS and aspiration windows around the previous iteration's value, instead of plain alpha-beta
+        # with full windows.
+        self.principal_variation = principal_variation
+        # How many plies past the depth limit the search may go to play out pending captures (see utils.py). 0 turns
+        # it off.
+        self.quiescence_plies = quiescence_plies
+        # The utilities of the evaluated states, kept for the whole game (see eval_cache.py). The number of entries
+        # is given, 0 turns it off. Only the searches run here use it, not the worker or ponder processes.
+        self.evaluation_cache = EvaluationCache(evaluation_cache_entries) if evaluation_cache_entries else None
+        # Evaluate the leaves under a depth 1 node together, with the batch_utility method of the player.
+        self.batch_evaluation = batch_evaluation
+        self.clock = time.process_time()
+        # The wall clock at the start of the move. With a search pool the time is measured on it, as this process
+        # barely uses its CPU while the workers search.
+        self.wall_clock = time.monotonic()
+
+        # We are simply providing (remaining time / remaining turns) for each turn in round.
+        # Taking a spare time of 0.05 seconds.
+        self.turns_remaining_in_round = self.k
+        self.time_remaining_in_round = self.time_per_k_turns
+        self.time_for_current_move = self.time_remaining_in_round / self.turns_remaining_in_round - 0.05
+
+    def get_move(self, game_state, possible_moves):
+        if self.transposition_table is not None:
+            self.transposition_table.new_search()
+        if self.move_orderer is not None:
+            self.move_orderer.new_search()
+        if self.search_pool is not None:
+            self.search_pool.new_search()
+        if self.search_stats is not None:
+            self.search_stats.reset()
+        # The pondering is stopped first, so that it does not compete with this search.
+        ponder_answer = self.ponderer.answer(game_state, possible_moves) if self.ponderer is not None else None
+        self.clock = time.process_time()
+        self.wall_clock = time.monotonic()
+        self.time_for_current_move = self.time_remaining_in_round / self.turns_remaining_in_round - 0.05
+        book_move = None
+        if self.opening_book is not None and len(possible_moves) > 1:
+            book_move = self.opening_book.choose(game_state, possible_moves)
+            print('opening book hits: {} of {} probes'.format(self.opening_book.hits, self.opening_book.probes))
+        if len(possible_moves) == 1 or book_move is not None:
+            move = book_move if book_move is not None else possible_moves[0]
+            self.end_move(game_state, move)
+            return move
+
+        current_depth = 1
+        prev_alpha = -INFINITY
+
+        # Choosing an arbitrary move in case Minimax does not return an answer:
+        best_move = possible_moves[0]
+
+        if ponder_answer is not None:
+            # The position was searched on the opponent's time, so the iterative deepening goes on from there.
+            pondered_depth, prev_alpha, best_move = ponder_answer
+            current_depth = pondered_depth + 1
+            print('pondering hit: depth {} already searched, best move: {}'.format(pondered_depth, best_move))
+
+        # Initialize Minimax algorithm, still not running anything
+        minimax = self.create_search()
+
+        # Iterative deepening until the time runs out.
+        while True:
+
+            print('going to depth: {}, remaining time: {}, prev_alpha: {}, best_move: {}'.format(
+                current_depth,
+                self.time_for_current_move - self.elapsed_time(),
+                prev_alpha,
+                best_move))
+
+            # The search checks this deadline itself, so no worker thread is left running when it passes.
+            deadline = time.monotonic() + self.iteration_time(current_depth)
+            if self.search_pool is not None:
+                # No iteration may go past the end of the move on the wall clock.
+                deadline = min(deadline, self.wall_clock + self.time_for_current_move)
+            try:
+                if self.principal_variation:
+                    alpha, move = aspiration_search(minimax, game_state, current_depth, prev_alpha, best_move,
+                                                    deadline=deadline)
+                else:
+                    alpha, move = minimax.search(game_state, current_depth, -INFINITY, INFINITY, True, best_move,
+                                                 deadline=deadline)
+            except MemoryError:
+                print('no more memory, achieved depth {}'.format(current_depth))
+                break
+            if self.search_stats is not None:
+                self.search_stats.record_iteration(current_depth, minimax.nodes, minimax.aborted)
+
+            if minimax.aborted:
+                print('no more time, achieved depth {}'.format(current_depth))
+                break
+
+            if self.no_more_time():
+                print('no more time')
+                break
+
+            prev_alpha = alpha
+            best_move = move
+
+            if alpha == INFINITY:
+                print('the move: {} will guarantee victory.'.format(best_move))
+                break
+
+            if alpha == -INFINITY:
+                print('all is lost')
+                break
+
+            current_depth += 1
+
+        if self.transposition_table is not None:
+            print('transposition table hits: {}, misses: {}'.format(self.transposition_table.hits,
+                                                                    self.transposition_table.misses))
+        if self.move_orderer is not None:
+            print('first move cutoff rate per depth: {}'.format(self.move_orderer.first_move_cutoff_rates()))
+        if self.evaluation_cache is not None:
+            print('evaluation cache hits: {} of {} probes ({:.1%})'.format(
+                self.evaluation_cache.hits, self.evaluation_cache.probes, self.evaluation_cache.hit_rate()))
+        if self.search_stats is not None:
+            self.search_stats.write(self.stats_path, color=self.color, player=self.__module__.split('.')[-1])
+
+        self.end_move(game_state, best_move)
+        return best_move
+
+    def create_search(self):
+        """The search of a move: a ParallelMiniMaxWithAlphaBetaPruning over the search pool if there is one, and
+        otherwise a PrincipalVariationSearch or a MiniMaxWithAlphaBetaPruning, as the options of the player say.
+        """
+        batch_utility = self.batch_utility if self.batch_evaluation else None
+        if self.search_pool is not None:
+            return ParallelMiniMaxWithAlphaBetaPruning(self.utility, self.color, self.no_more_time,
+                                                       self.selective_deepening_criterion, self.search_pool,
+                                                       transposition_table=self.transposition_table,
+                                                       move_orderer=self.move_orderer,
+                                                       batch_utility=batch_utility,
+                                                       tablebase=self.tablebase,
+                                                       stats=self.search_stats,
+                                                       principal_variation=self.principal_variation,
+                                                       quiescence_plies=self.quiescence_plies)
+        engine = PrincipalVariationSearch if self.principal_variation else MiniMaxWithAlphaBetaPruning
+        utility = self.utility
+        if self.evaluation_cache is not None:
+            utility = self.evaluation_cache.wrap(self.utility, self.evaluation_key)
+        return engine(utility, self.color, self.no_more_time,
+                      self.selective_deepening_criterion,
+                      transposition_table=self.transposition_table,
+                      move_orderer=self.move_orderer,
+                      batch_utility=batch_utility,
+                      tablebase=self.tablebase,
+                      stats=self.search_stats,
+                      quiescence_plies=self.quiescence_plies)
+
+    def evaluation_key(self, state):
+        """The key of a state in the evaluation cache: its Zobrist key, which is enough for a utility of the position
+        only. The states drawn by the turns without jumps, which the key does not tell apart, are not cached.
+        """
+        if state.turns_since_last_jump >= MAX_TURNS_NO_JUMP:
+            return None
+        return state.zobrist_key
+
+    def iteration_time(self, depth):
+        """The time in seconds that the iteration to the given depth may take: the rest of the time of the move."""
+        return self.time_for_current_move - self.elapsed_time()
+
+    def end_move(self, game_state, move):
+        """Called with the chosen move, before get_move returns it. Updates the time of the round, and starts
+        pondering over the opponent's replies.
+        """
+        if self.turns_remaining_in_round == 1:
+            self.turns_remaining_in_round = self.k
+            self.time_remaining_in_round = self.time_per_k_turns
+        else:
+            self.turns_remaining_in_round -= 1
+            self.time_remaining_in_round -= self.elapsed_time()
+        if self.ponderer is not None:
+            self.ponderer.start(game_state, move, self.utility, self.color, self.selective_deepening_criterion,
+                                tablebase=self.tablebase,
+                                batch_utility=self.batch_utility if self.batch_evaluation else None,
+                                quiescence_plies=self.quiescence_plies)
+
+    def game_over(self):
+        if self.ponderer is not None:
+            self.ponderer.shutdown()
+        if self.search_pool is not None:
+            self.search_pool.shutdown()
+
+    def elapsed_time(self):
+        """The time spent on the current move: the CPU time of this process, or the wall time with a search pool."""
+        if self.search_pool is not None:
+            return time.monotonic() - self.wall_clock
+        return time.process_time() - self.clock
+
+    def no_more_time(self):
+        return self.elapsed_time() >= self.time_for_current_move
+
+    def __getstate__(self):
+        """Pickles the player without its search resources (tables, worker pools, files), so that its evaluation
+        methods can be sent to the worker processes of a parallel search and to the ponder process.
+        """
+        state = self.__dict__.copy()
+        for name in ('transposition_table', 'move_orderer', 'search_pool', 'tablebase', 'opening_book',
+                     'search_stats', 'ponderer', 'evaluation_cache'):
+            state[name] = None
+        return state
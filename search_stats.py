@@ -0,0 +1,94 @@
+"""Search statistics: where the search of a move spends its nodes and its time.
+
+A SearchStats is given to MiniMaxWithAlphaBetaPruning (or to ParallelMiniMaxWithAlphaBetaPruning, whose workers
+send theirs back with their results), and the search counts into it. The counters and timers are only touched when
+it is given, so a search without one pays for a few `is None` checks per node and nothing else.
+
+A player keeps one for the whole game, resets it at the start of every get_move, records every iteration of the
+iterative deepening, and appends the statistics of the move to a JSON lines file, one object per line:
+    {"color": "red", "move": 12, "depth": 6, "nodes": 51234, "leaves": 40211, "cutoffs": 7420, ...}
+"""
+import json
+import time
+
+# The counters, summed by merge.
+COUNTERS = ('nodes', 'leaves', 'expanded', 'generated_moves', 'cutoffs', 'first_move_cutoffs', 'tt_probes',
+            'tt_hits', 'tt_cutoffs', 'tablebase_hits', 'researches')
+
+# The timers, in seconds of time.perf_counter, also summed by merge.
+TIMERS = ('move_generation_time', 'make_move_time', 'utility_time')
+
+
+class SearchStats:
+    def __init__(self):
+        self.moves = 0
+        self.reset()
+
+    def reset(self):
+        """Clears the statistics, for the search of a new move."""
+        for name in COUNTERS + TIMERS:
+            setattr(self, name, 0)
+        # The deepest ply the search reached, selective deepening included.
+        self.max_ply = 0
+        # A list of (depth, nodes, aborted) tuples, one per iteration of the iterative deepening.
+        self.iterations = []
+        self.start_time = time.perf_counter()
+
+    def merge(self, other):
+        """Adds the counters and timers of another SearchStats, e.g. of a worker process, to these ones."""
+        for name in COUNTERS + TIMERS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.max_ply = max(self.max_ply, other.max_ply)
+
+    def record_iteration(self, depth, nodes, aborted):
+        """Records an iteration of the iterative deepening, after the search returned."""
+        self.iterations.append((depth, nodes, aborted))
+
+    def depth(self):
+        """The depth of the deepest iteration that was searched to the end, 0 if there is none."""
+        return max((depth for depth, _, aborted in self.iterations if not aborted), default=0)
+
+    def branching_factor(self):
+        """The mean number of moves of the expanded nodes."""
+        return self.generated_moves / self.expanded if self.expanded else 0.0
+
+    def effective_branching_factor(self):
+        """The ratio between the nodes of the last two complete iterations, how much one more ply costs."""
+        nodes = [iteration_nodes for _, iteration_nodes, aborted in self.iterations if not aborted]
+        if len(nodes) < 2 or nodes[-2] == 0:
+            return 0.0
+        return nodes[-1] / nodes[-2]
+
+    def record(self, **fields):
+        """The statistics of the current move as a JSON-serializable dict, with the given extra fields first."""
+        elapsed = time.perf_counter() - self.start_time
+        record = dict(fields)
+        record.update((name, getattr(self, name)) for name in COUNTERS)
+        record.update((name, round(getattr(self, name), 6)) for name in TIMERS)
+        record.update(
+            depth=self.depth(),
+            max_ply=self.max_ply,
+            iterations=[list(iteration) for iteration in self.iterations],
+            first_move_cutoff_rate=self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0,
+            tt_hit_rate=self.tt_hits / self.tt_probes if self.tt_probes else 0.0,
+            branching_factor=self.branching_factor(),
+            effective_branching_factor=self.effective_branching_factor(),
+            time=round(elapsed, 6),
+            nodes_per_second=self.nodes / elapsed if elapsed else 0.0,
+        )
+        return record
+
+    def write(self, path, **fields):
+        """Appends the record of the current move to a JSON lines file.
+
+        :param fields: Extra fields of the record, e.g. the player's color.
+        """
+        self.moves += 1
+        with open(path, 'a') as f:
+            f.write(json.dumps(self.record(move=self.moves, **fields)) + '\n')
+
+
+def read(path):
+    """The records of a JSON lines file written by SearchStats.write, as a list of dicts."""
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
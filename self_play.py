@@ -0,0 +1,265 @@
+"""Self-play data generation: labelled positions for tuning the evaluation weights.
+
+Worker processes play games between two players, each searching every move to a fixed depth with its own utility.
+Every game starts with a few random moves, so the games differ, and these moves are not recorded. If they end the
+game, they are drawn again, so that every game has positions to record. Every later position is recorded with the
+value of its search and the final result of the game, both from the point of view of the player to move. The search
+tables start empty in every game, so a game does not depend on the games the worker played before it.
+
+The output file is a header followed by chunks, each one a little-endian uint32 record count followed by that many
+fixed size records of RECORD_DTYPE. A chunk only holds whole games, and is written once enough records are
+buffered, so the memory used does not grow with the number of games. An interrupted run is resumed by running it
+again with the same path: a chunk that was cut off is dropped, and the games that are not in the file are played.
+Game n always starts with the same random moves for the same seed, so a resumed run plays the openings it would
+have played.
+
+    python self_play.py games [path] [--depth D] [--red P] [--black P] [--random-plies N] [--chunk-records N]
+                        [--workers N] [--seed S]
+"""
+import argparse
+import os
+import random
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+from checkers.board import GameState
+from checkers.consts import RED_PLAYER, BLACK_PLAYER, OPPONENT_COLOR, MAX_TURNS_NO_JUMP
+from utils import MiniMaxWithAlphaBetaPruning, INFINITY
+from transposition import TranspositionTable
+from move_ordering import MoveOrderer
+
+MAGIC = b'CHECKERS-PLAY-1'
+HEADER_SIZE = 16
+
+DEFAULT_PATH = 'self_play.bin'
+
+# The record count at the start of every chunk.
+CHUNK_HEADER = struct.Struct('<I')
+
+# A position (the bitboards of GameState), the player to move (0 for red, 1 for black), the number of plies
+# played, the search value and the result of the game (1 win, 0 draw, -1 loss) for the player to move, and the
+# number of the game.
+RECORD_DTYPE = np.dtype([('red', '<u4'), ('black', '<u4'), ('kings', '<u4'), ('side', 'u1'), ('result', 'i1'),
+                         ('ply', '<u2'), ('score', '<f4'), ('game', '<u4')])
+
+PLAYER_SIDES = {RED_PLAYER: 0, BLACK_PLAYER: 1}
+
+# The number of records buffered before a chunk is written.
+CHUNK_RECORDS = 1 << 16
+
+# A game that reaches this many plies is scored as a draw.
+MAX_GAME_PLIES = 400
+
+# The size of the transposition tables of every worker, in megabytes.
+PLAY_TABLE_MB = 16
+
+
+# ===============================================================================
+# Playing
+# ===============================================================================
+
+# The players and transposition tables of a worker process, created by its first game.
+_worker = {}
+
+
+def _searchers(red_player, black_player):
+    """The (player, transposition table) of each color of a worker process. The tables are cleared for a new game."""
+    if _worker.get('player_names') != (red_player, black_player):
+        searchers = {}
+        for color, player_name in ((RED_PLAYER, red_player), (BLACK_PLAYER, black_player)):
+            player_module = __import__('players.{}'.format(player_name), fromlist=['Player'])
+            searchers[color] = (player_module.Player(INFINITY, color, INFINITY, 1), TranspositionTable(PLAY_TABLE_MB))
+        _worker['player_names'] = (red_player, black_player)
+        _worker['searchers'] = searchers
+    for _, transposition_table in _worker['searchers'].values():
+        transposition_table.clear()
+    return _worker['searchers']
+
+
+def _random_opening(rng, random_plies):
+    """Plays the random moves a game starts with.
+
+    :return: A tuple: (The state after them, The number of moves played)
+    """
+    state = GameState()
+    ply = 0
+    for _ in range(rng.randint(random_plies // 2, random_plies)):
+        moves = state.get_possible_moves()
+        if not moves:
+            break
+        state.perform_move(rng.choice(moves))
+        ply += 1
+    return state, ply
+
+
+def play_game(game, red_player, black_player, depth, random_plies, seed):
+    """Plays a game and records its positions. Runs in a worker process.
+
+    :param game: The number of the game, which with the seed picks its random opening moves.
+    :param red_player: The name of the player module whose utility the red searches use, e.g. better_h_player.
+    :param black_player: Same as 'red_player' parameter, but for the black one.
+    :param depth: The depth every move is searched to.
+    :param random_plies: The largest number of random moves the game starts with. Every game draws its own number,
+                         from half of it up. It should be below MAX_GAME_PLIES.
+    :return: An array of RECORD_DTYPE records, one per position after the random moves, at least one.
+    """
+    searchers = _searchers(red_player, black_player)
+    move_orderer = MoveOrderer()
+    rng = random.Random('{}-{}'.format(seed, game))
+    state, ply = _random_opening(rng, random_plies)
+    while not state.get_possible_moves() or state.turns_since_last_jump >= MAX_TURNS_NO_JUMP:
+        state, ply = _random_opening(rng, random_plies)
+
+    positions = []
+    winner = None
+    while ply < MAX_GAME_PLIES and state.turns_since_last_jump < MAX_TURNS_NO_JUMP:
+        moves = state.get_possible_moves()
+        if not moves:
+            winner = OPPONENT_COLOR[state.curr_player]
+            break
+        player, transposition_table = searchers[state.curr_player]
+        player.curr_board = state.board
+        transposition_table.new_search()
+        move_orderer.new_search()
+        minimax = MiniMaxWithAlphaBetaPruning(player.utility, player.color, lambda: False,
+                                              player.selective_deepening_criterion,
+                                              transposition_table=transposition_table, move_orderer=move_orderer)
+        value, move = minimax.search(state, depth, -INFINITY, INFINITY, True)
+        positions.append((state.red, state.black, state.kings, PLAYER_SIDES[state.curr_player], 0, ply, value, game))
+        state.perform_move(move if move is not None else moves[0])
+        ply += 1
+
+    records = np.array(positions, dtype=RECORD_DTYPE)
+    if winner is not None:
+        records['result'] = np.where(records['side'] == PLAYER_SIDES[winner], 1, -1)
+    return records
+
+
+# ===============================================================================
+# Output
+# ===============================================================================
+
+def _check_header(f, path):
+    if not f.read(HEADER_SIZE).startswith(MAGIC):
+        raise ValueError('{} is not a self-play file'.format(path))
+
+
+def read_chunks(path):
+    """Yields the chunks of a self-play file as arrays of RECORD_DTYPE records, one at a time, so that a file of
+    any size can be read in bounded memory. A chunk that was cut off at the end of the file is not yielded.
+    """
+    with open(path, 'rb') as f:
+        _check_header(f, path)
+        while True:
+            header = f.read(CHUNK_HEADER.size)
+            if len(header) < CHUNK_HEADER.size:
+                return
+            count, = CHUNK_HEADER.unpack(header)
+            data = f.read(count * RECORD_DTYPE.itemsize)
+            if len(data) < count * RECORD_DTYPE.itemsize:
+                return
+            yield np.frombuffer(data, dtype=RECORD_DTYPE)
+
+
+def load(path):
+    """All the records of a self-play file, as one array."""
+    chunks = list(read_chunks(path))
+    return np.concatenate(chunks) if chunks else np.empty(0, dtype=RECORD_DTYPE)
+
+
+def _resume(path):
+    """Opens a self-play file for appending, creating it if needed, and drops a chunk that was cut off at its end.
+
+    :return: A tuple: (The file, The set of the numbers of the games already in it).
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        f = open(path, 'wb')
+        f.write(MAGIC.ljust(HEADER_SIZE, b'\0'))
+        return f, set()
+    games = set()
+    end = HEADER_SIZE
+    for chunk in read_chunks(path):
+        games.update(np.unique(chunk['game']).tolist())
+        end += CHUNK_HEADER.size + chunk.nbytes
+    f = open(path, 'r+b')
+    f.truncate(end)
+    f.seek(end)
+    return f, games
+
+
+def _write_chunk(f, records):
+    records = np.concatenate(records)
+    f.write(CHUNK_HEADER.pack(len(records)))
+    f.write(records.tobytes())
+    f.flush()
+    os.fsync(f.fileno())
+    return len(records)
+
+
+def generate(games, path, depth=4, red_player='better_h_player', black_player='better_h_player', random_plies=8,
+             chunk_records=CHUNK_RECORDS, workers=None, seed=0):
+    """Plays self-play games in parallel and streams their records to a file, resuming it if it exists.
+
+    :param games: The number of games the file should hold when done, including the ones already in it.
+    :param chunk_records: The number of records buffered before a chunk is written.
+    :param workers: The number of worker processes. Defaults to the number of CPUs.
+    The other parameters are the ones of play_game.
+    """
+    if random_plies >= MAX_GAME_PLIES:
+        raise ValueError('The random moves must be fewer than the {} plies of a game'.format(MAX_GAME_PLIES))
+    workers = workers or os.cpu_count()
+    f, done = _resume(path)
+    pending = (game for game in range(games) if game not in done)
+    if done:
+        print('resuming: {} of {} games already played'.format(len(done), games))
+    start_time = time.perf_counter()
+    buffered = []
+    buffered_count = 0
+    written = 0
+    played = 0
+    with f, ProcessPoolExecutor(max_workers=workers) as executor:
+        # A few games per worker are submitted at a time, so the finished games waiting to be written stay few.
+        in_flight = set()
+        while True:
+            for game in pending:
+                in_flight.add(executor.submit(play_game, game, red_player, black_player, depth, random_plies,
+                                              seed))
+                if len(in_flight) >= 2 * workers:
+                    break
+            if not in_flight:
+                break
+            finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                records = future.result()
+                played += 1
+                buffered.append(records)
+                buffered_count += len(records)
+            if buffered_count >= chunk_records:
+                written += _write_chunk(f, buffered)
+                buffered = []
+                buffered_count = 0
+                elapsed = time.perf_counter() - start_time
+                print('{} games, {} records ({:.1f} s, {:.1f} games/s)'.format(
+                    len(done) + played, written, elapsed, played / elapsed))
+        if buffered:
+            written += _write_chunk(f, buffered)
+    print('{} games played, {} records written ({:.1f} s)'.format(played, written, time.perf_counter() - start_time))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generates labelled positions by self-play.')
+    parser.add_argument('games', type=int, help='The number of games the output should hold when done.')
+    parser.add_argument('path', nargs='?', default=DEFAULT_PATH, help='The output file, resumed if it exists.')
+    parser.add_argument('--depth', type=int, default=4, help='The depth every move is searched to.')
+    parser.add_argument('--red', default='better_h_player', help='The player module of the red searches.')
+    parser.add_argument('--black', default='better_h_player', help='The player module of the black searches.')
+    parser.add_argument('--random-plies', type=int, default=8,
+                        help='The largest number of random moves a game starts with.')
+    parser.add_argument('--chunk-records', type=int, default=CHUNK_RECORDS,
+                        help='The number of records buffered before a chunk is written.')
+    parser.add_argument('--workers', type=int, default=None, help='The number of worker processes.')
+    parser.add_argument('--seed', type=int, default=0, help='The seed of the random opening moves.')
+    args = parser.parse_args()
+    generate(args.games, args.path, depth=args.depth, red_player=args.red, black_player=args.black,
+             random_plies=args.random_plies, chunk_records=args.chunk_records, workers=args.workers, seed=args.seed)
@@ -0,0 +1,305 @@
+"""An endgame tablebase: the exact result of every position with few tools, found by retrograde analysis.
+
+The tablebase holds every position with at most max_pieces tools, both players having at least one, in blocks by
+material: the numbers of red pawns, red kings, black pawns and black kings. Within a block, a position's index
+is built from the player to move and the combinatorial rank of the squares of each tool type. Indexes of
+impossible positions (two tools on one square, a pawn on its promotion row) are kept, but never reached.
+
+Every position has one byte: 0 for a draw, or the number of plies to the end of the game plus 1. The game ends
+when the player to move has no moves, so the player to move wins when that number of plies is odd. The counter of
+turns without jumps (MAX_TURNS_NO_JUMP) is not part of the position, so a long win may still be drawn by it: the
+score of a state takes it as a draw when the game can not end before the counter does.
+
+Generation goes over the blocks in an order where every block only leads to solved ones or to itself: captures
+lead to fewer tools, and promotions to fewer pawns. The moves of a block are generated in parallel over slices of
+its indexes, and the block is then solved by value iteration over the plies with NumPy.
+
+    python tablebase.py max_pieces [path] [--workers N]
+"""
+import argparse
+import functools
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from checkers.board import GameState
+from checkers.bitboard import PROMOTION_MASK, squares
+from checkers.consts import RED_PLAYER, BLACK_PLAYER, NUM_SQUARES, MAX_TURNS_NO_JUMP
+from utils import INFINITY
+
+MAGIC = b'CHECKERS-TB-1'
+HEADER_SIZE = 16
+
+DEFAULT_PATH = 'tablebase_{}.bin'
+
+# The number of indexes generated by every worker task.
+SLICE_SIZE = 1 << 15
+
+# BINOMIAL[n][k] is n choose k.
+BINOMIAL = [[0] * (NUM_SQUARES + 1) for _ in range(NUM_SQUARES + 1)]
+for _n in range(NUM_SQUARES + 1):
+    BINOMIAL[_n][0] = 1
+    for _k in range(1, _n + 1):
+        BINOMIAL[_n][_k] = BINOMIAL[_n - 1][_k - 1] + BINOMIAL[_n - 1][_k]
+
+PLAYER_SIDES = {RED_PLAYER: 0, BLACK_PLAYER: 1}
+SIDE_PLAYERS = (RED_PLAYER, BLACK_PLAYER)
+
+
+# ===============================================================================
+# Indexing
+# ===============================================================================
+
+def combination_rank(bb):
+    """The colexicographic rank of the set of squares in the bitboard, among the sets of its size."""
+    rank = 0
+    for i, sq in enumerate(squares(bb)):
+        rank += BINOMIAL[sq][i + 1]
+    return rank
+
+
+def combination_unrank(rank, count):
+    """The bitboard of the set of count squares whose colexicographic rank is the given one."""
+    bb = 0
+    sq = NUM_SQUARES
+    for i in range(count, 0, -1):
+        sq -= 1
+        while BINOMIAL[sq][i] > rank:
+            sq -= 1
+        rank -= BINOMIAL[sq][i]
+        bb |= 1 << sq
+    return bb
+
+
+def material(red, black, kings):
+    """The material of a position: (red pawns, red kings, black pawns, black kings)."""
+    return ((red & ~kings).bit_count(), (red & kings).bit_count(),
+            (black & ~kings).bit_count(), (black & kings).bit_count())
+
+
+@functools.lru_cache(maxsize=None)
+def layout(max_pieces):
+    """The blocks of a tablebase, in generation order.
+
+    :return: A tuple: (A list of the materials of the blocks, A dict of the form material:(offset, size),
+             The total number of indexes)
+    """
+    materials = [counts for total in range(2, max_pieces + 1)
+                 for counts in itertools.product(range(total + 1), repeat=4)
+                 if sum(counts) == total and counts[0] + counts[1] > 0 and counts[2] + counts[3] > 0]
+    # Captures lead to blocks with fewer tools, and promotions to blocks with fewer pawns.
+    materials.sort(key=lambda counts: (sum(counts), counts[0] + counts[2]))
+    blocks = {}
+    offset = 0
+    for counts in materials:
+        size = 2
+        for count in counts:
+            size *= BINOMIAL[NUM_SQUARES][count]
+        blocks[counts] = (offset, size)
+        offset += size
+    return materials, blocks, offset
+
+
+def position_index(blocks, red, black, kings, curr_player):
+    """The index of a position in the tablebase, or None if it has a material that the tablebase does not hold."""
+    block = blocks.get(material(red, black, kings))
+    if block is None:
+        return None
+    index = PLAYER_SIDES[curr_player]
+    for bb in (red & ~kings, red & kings, black & ~kings, black & kings):
+        index = index * BINOMIAL[NUM_SQUARES][bb.bit_count()] + combination_rank(bb)
+    return block[0] + index
+
+
+def position_at(counts, index):
+    """The position at an index within the block of the given material.
+
+    :return: A tuple: (red, black, kings, curr_player), or None for an impossible position.
+    """
+    tools = []
+    for count in reversed(counts):
+        index, rank = divmod(index, BINOMIAL[NUM_SQUARES][count])
+        tools.append(combination_unrank(rank, count))
+    black_kings, black_pawns, red_kings, red_pawns = tools
+    if (red_pawns.bit_count() + red_kings.bit_count() + black_pawns.bit_count() + black_kings.bit_count()
+            != (red_pawns | red_kings | black_pawns | black_kings).bit_count()):
+        return None
+    if red_pawns & PROMOTION_MASK[RED_PLAYER] or black_pawns & PROMOTION_MASK[BLACK_PLAYER]:
+        return None
+    return red_pawns | red_kings, black_pawns | black_kings, red_kings | black_kings, SIDE_PLAYERS[index]
+
+
+# ===============================================================================
+# Generation
+# ===============================================================================
+
+# Successor index of a position where the player to move has no tools left.
+NO_TOOLS = -1
+
+
+def _generate_slice(max_pieces, counts, start, stop):
+    """Generates the moves of the positions start..stop of a block. Runs in a worker process.
+
+    :return: A tuple: (An int16 array of the number of moves of every position, -1 for impossible positions,
+             An int32 array of the tablebase indexes the moves lead to, NO_TOOLS when the opponent has no tools)
+    """
+    _, blocks, _ = layout(max_pieces)
+    move_counts = np.empty(stop - start, dtype=np.int16)
+    successors = []
+    for i in range(start, stop):
+        position = position_at(counts, i)
+        if position is None:
+            move_counts[i - start] = -1
+            continue
+        state = GameState.from_bitboards(*position)
+        moves = state.get_possible_moves()
+        move_counts[i - start] = len(moves)
+        for move in moves:
+            undo = state.perform_move(move)
+            if not state.player_tools(state.curr_player):
+                successors.append(NO_TOOLS)
+            else:
+                successors.append(position_index(blocks, state.red, state.black, state.kings, state.curr_player))
+            state.undo_move(move, undo)
+    return move_counts, np.array(successors, dtype=np.int32)
+
+
+def _solve_block(plies, offset, move_counts, successors):
+    """Solves a block by value iteration: at iteration k, a position is won in k plies if a move leads to a position
+    lost in k-1 plies, and lost in k plies if all of its moves lead to positions won in at most k-1 plies.
+
+    :param plies: The int16 plies to the end of every tablebase position, -1 for unknown. Its last element is 0,
+                  so that NO_TOOLS successors are lost positions. The block is filled in place.
+    """
+    valid = move_counts >= 0
+    lengths = np.maximum(move_counts, 0).astype(np.int64)
+    block_plies = plies[offset:offset + len(move_counts)]
+    block_plies[valid & (lengths == 0)] = 0
+    has_moves = lengths > 0
+    starts = (np.cumsum(lengths) - lengths)[has_moves]
+    unknown = has_moves.copy()
+
+    k = 1
+    while unknown.any():
+        successor_plies = plies[successors]
+        known = successor_plies >= 0
+        if not known.any() or k > successor_plies.max() + 1:
+            # Nothing new can be resolved, the rest are draws.
+            break
+        lost_now = (successor_plies == k - 1) & (successor_plies % 2 == 0)
+        wins = np.logical_or.reduceat(lost_now, starts)
+        all_won = np.logical_and.reduceat(known & (successor_plies % 2 == 1), starts)
+        longest = np.maximum.reduceat(successor_plies, starts)
+        losses = all_won & (longest == k - 1)
+        resolved = np.zeros(len(move_counts), dtype=bool)
+        resolved[has_moves] = wins | losses
+        resolved &= unknown
+        block_plies[resolved] = k
+        unknown &= ~resolved
+        k += 1
+
+
+def generate(max_pieces, path, workers=None):
+    """Generates the tablebase of all the positions with at most max_pieces tools and writes it to path."""
+    materials, blocks, total = layout(max_pieces)
+    plies = np.full(total + 1, -1, dtype=np.int16)
+    plies[-1] = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for counts in materials:
+            start_time = time.perf_counter()
+            offset, size = blocks[counts]
+            slices = [(start, min(start + SLICE_SIZE, size)) for start in range(0, size, SLICE_SIZE)]
+            results = list(executor.map(_generate_slice, itertools.repeat(max_pieces), itertools.repeat(counts),
+                                        *zip(*slices)))
+            move_counts = np.concatenate([result[0] for result in results])
+            successors = np.concatenate([result[1] for result in results])
+            _solve_block(plies, offset, move_counts, successors)
+            block_plies = plies[offset:offset + size]
+            print('{}: {} positions, {} won, {} lost, longest {} plies ({:.1f} s)'.format(
+                counts, (move_counts >= 0).sum(), ((block_plies > 0) & (block_plies % 2 == 1)).sum(),
+                ((block_plies >= 0) & (block_plies % 2 == 0) & (move_counts >= 0)).sum(), block_plies.max(),
+                time.perf_counter() - start_time))
+
+    if plies.max() >= 255:
+        raise ValueError('A position is longer than a byte can hold: {} plies'.format(plies.max()))
+    values = (plies[:-1] + 1).astype(np.uint8)
+    with open(path, 'wb') as f:
+        f.write(MAGIC.ljust(HEADER_SIZE - 1, b'\0') + bytes([max_pieces]))
+        values.tofile(f)
+
+
+# ===============================================================================
+# Probing
+# ===============================================================================
+
+class Tablebase:
+    def __init__(self, path):
+        """Opens a generated tablebase. The file is memory mapped, so only the probed pages are read.
+
+        :param path: The file written by generate.
+        """
+        with open(path, 'rb') as f:
+            header = f.read(HEADER_SIZE)
+        if not header.startswith(MAGIC):
+            raise ValueError('{} is not a tablebase file'.format(path))
+        self.path = path
+        self.max_pieces = header[-1]
+        _, self.blocks, total = layout(self.max_pieces)
+        self.values = np.memmap(path, dtype=np.uint8, mode='r', offset=HEADER_SIZE, shape=(total,))
+        self.hits = 0
+
+    def probe(self, state):
+        """Looks a state up.
+
+        :return: None if the tablebase does not hold the state, 0 for a draw, or else the number of plies to the
+                 end of the game plus 1.
+        """
+        tools = state.red | state.black
+        if tools.bit_count() > self.max_pieces:
+            return None
+        index = position_index(self.blocks, state.red, state.black, state.kings, state.curr_player)
+        if index is None:
+            return None
+        self.hits += 1
+        return int(self.values[index])
+
+    def score(self, state, color):
+        """The value of a state for the search, from the given player's point of view: a win scores less than
+        INFINITY the longer it takes, and a loss scores more than -INFINITY the longer it is put off. A game that
+        would reach MAX_TURNS_NO_JUMP turns without jumps before its end is a draw. The jumps on the way, which
+        reset the counter, are not known, so that is assumed whenever it could happen without them.
+
+        :return: The value, or None if the tablebase does not hold the state.
+        """
+        value = self.probe(state)
+        if value is None:
+            return None
+        if value == 0:
+            return 0
+        plies = value - 1
+        if state.turns_since_last_jump + plies / 2 >= MAX_TURNS_NO_JUMP:
+            return 0
+        wins = plies % 2 == 1
+        if (state.curr_player == color) == wins:
+            return INFINITY - 1 - plies
+        return -(INFINITY - 1 - plies)
+
+    def __getstate__(self):
+        # The memory map is reopened rather than copied.
+        return self.path
+
+    def __setstate__(self, path):
+        self.__init__(path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generates an endgame tablebase.')
+    parser.add_argument('max_pieces', type=int, help='The number of tools on the board, up to which to generate.')
+    parser.add_argument('path', nargs='?', default=None, help='The output file.')
+    parser.add_argument('--workers', type=int, default=None, help='The number of worker processes.')
+    args = parser.parse_args()
+    path = args.path or DEFAULT_PATH.format(args.max_pieces)
+    start_time = time.perf_counter()
+    generate(args.max_pieces, path, workers=args.workers)
+    print('total time: {:.1f} s, size: {} bytes'.format(time.perf_counter() - start_time, os.path.getsize(path)))
@@ -0,0 +1,38 @@
+"""Tests of the NumPy batch evaluation of improved_better_h_player against its utility."""
+import random
+import pytest
+from checkers.board import GameState
+from checkers.consts import RED_PLAYER, BLACK_PLAYER, MAX_TURNS_NO_JUMP
+from players.improved_better_h_player import Player, batch_eval
+
+NUM_STATES = 2000
+
+
+def random_states(seed):
+    """Random positions, of any number of pawns and kings of each color, with either player to move."""
+    rng = random.Random(seed)
+    for _ in range(NUM_STATES):
+        squares = rng.sample(range(32), rng.randint(1, 24))
+        red = black = kings = 0
+        for sq in squares:
+            if rng.random() < 0.5:
+                red |= 1 << sq
+            else:
+                black |= 1 << sq
+            if rng.random() < 0.3:
+                kings |= 1 << sq
+        turns = rng.choice([0, rng.randint(0, 2 * MAX_TURNS_NO_JUMP) / 2, MAX_TURNS_NO_JUMP])
+        yield GameState.from_bitboards(red, black, kings, rng.choice([RED_PLAYER, BLACK_PLAYER]), turns)
+
+
+@pytest.mark.parametrize('color', [RED_PLAYER, BLACK_PLAYER])
+@pytest.mark.parametrize('seed', range(2))
+def test_batch_utility_equals_utility(color, seed):
+    player = Player(1, color, 1, 1)
+    states = list(random_states(seed))
+    player.curr_board = states[0].board
+    values, only_kings = batch_eval.utility(states, color, player.weights)
+    for state, value, state_only_kings in zip(states, values.tolist(), only_kings.tolist()):
+        if not state_only_kings:
+            assert value == player.utility(state)
+    assert player.batch_utility(states) == [player.utility(state) for state in states]
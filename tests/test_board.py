@@ -0,0 +1,121 @@
+"""Tests of GameState: make/unmake restores the state exactly, and the capture moves are the ones of the
+recursive generator that the bitboard one replaced."""
+import copy
+import random
+import pytest
+from checkers.board import GameState
+from checkers.bitboard import FULL_BOARD
+from checkers.consts import RED_PLAYER, BLACK_PLAYER, OPPONENT_COLOR, OPPONENT_COLORS, EM, LOC_SQUARES
+from checkers.moves import TOOL_CAPTURE_MOVES
+
+NUM_GAMES = 50
+MAX_PLIES = 150
+
+
+def random_games(seed):
+    """Yields the state of every ply of seeded random games, and the moves possible in it."""
+    rng = random.Random(seed)
+    for _ in range(NUM_GAMES):
+        state = GameState()
+        for _ in range(MAX_PLIES):
+            moves = state.get_possible_moves()
+            if not moves:
+                break
+            yield state, moves
+            state.perform_move(rng.choice(moves))
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_undo_move_restores_the_state(seed):
+    for state, moves in random_games(seed):
+        before = copy.deepcopy(state)
+        board = dict(state.board)
+        for move in moves:
+            undo = state.perform_move(move)
+            assert state != before
+            state.undo_move(move, undo)
+            assert state == before
+            assert hash(state) == hash(before)
+            assert state.zobrist_key == before.zobrist_key
+            assert state.turns_since_last_jump == before.turns_since_last_jump
+            assert state.board == board
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_undo_move_restores_the_state_after_a_line_of_moves(seed):
+    rng = random.Random(seed)
+    for state, moves in random_games(seed):
+        if rng.random() > 0.05:
+            continue
+        before = copy.deepcopy(state)
+        board = dict(state.board)
+        line = []
+        for _ in range(rng.randint(1, 8)):
+            line_moves = state.get_possible_moves()
+            if not line_moves:
+                break
+            move = rng.choice(line_moves)
+            line.append((move, state.perform_move(move)))
+        for move, undo in reversed(line):
+            state.undo_move(move, undo)
+        assert state == before
+        assert hash(state) == hash(before)
+        assert state.board == board
+
+
+def old_capture_sequences(state, origin_loc, cur_loc, possible_moves, already_jumped):
+    """A frozen copy of the recursive GameState.find_all_capture_sequence that _capture_moves replaced.
+
+    :return: A list of (sequence final location, list of the jumped locations) tuples.
+    """
+    board = state.board
+    possible_next_jumps = [(jumped, next_loc)
+                           for jumped, next_loc in possible_moves[cur_loc]
+                           if board[jumped] in OPPONENT_COLORS[state.curr_player]
+                           and (board[next_loc] == EM or next_loc == origin_loc)
+                           and jumped not in already_jumped]
+
+    capture_seqs = []
+    for jumped, next_loc in possible_next_jumps:
+        for target, seq in old_capture_sequences(state, origin_loc, next_loc, possible_moves,
+                                                 already_jumped + [jumped]):
+            capture_seqs.append((target, [jumped] + seq))
+
+    if len(capture_seqs) == 0:
+        return [(cur_loc, [])]
+    return capture_seqs
+
+
+def random_positions(seed, count):
+    """Random positions, crowded and with many kings, so that long and looping capture sequences are common."""
+    rng = random.Random(seed)
+    for _ in range(count):
+        red = black = kings = 0
+        for sq in rng.sample(range(32), rng.randint(2, 24)):
+            if rng.random() < 0.5:
+                red |= 1 << sq
+            else:
+                black |= 1 << sq
+            if rng.random() < 0.5:
+                kings |= 1 << sq
+        yield GameState.from_bitboards(red, black, kings, rng.choice([RED_PLAYER, BLACK_PLAYER]))
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_capture_moves_match_the_recursive_generator(seed):
+    positions = list(random_positions(seed, 2000))
+    positions.extend(copy.deepcopy(state) for state, _ in random_games(seed))
+    captures = 0
+    for state in positions:
+        opponents = state.player_tools(OPPONENT_COLOR[state.curr_player])
+        empty = ~(state.red | state.black) & FULL_BOARD
+        origin_locs = {origin for origin, _, _ in state.calc_capture_moves()}
+        for origin_loc in origin_locs:
+            tool = state.board[origin_loc]
+            origin = LOC_SQUARES[origin_loc]
+            expected = old_capture_sequences(state, origin_loc, origin_loc, TOOL_CAPTURE_MOVES[tool], [])
+            moves = list(state._capture_moves(origin, tool, opponents, empty | (1 << origin)))
+            assert [(move.target_loc, move.jumped_locs) for move in moves] == expected
+            assert all(move.player_type == tool and move.origin_loc == origin_loc for move in moves)
+            captures += len(moves)
+    assert captures > 0
@@ -0,0 +1,80 @@
+"""Tests of the root-parallel search: its values, and the time it takes in a player."""
+import copy
+import random
+import time
+import pytest
+from checkers.board import GameState
+from checkers.consts import RED_PLAYER
+from utils import MiniMaxWithAlphaBetaPruning, INFINITY
+from parallel_search import SearchPool, ParallelMiniMaxWithAlphaBetaPruning
+from players.better_h_player import Player
+
+SEARCH_DEPTH = 4
+
+# The time a move may take past its budget: the workers check the stop flag once every TIME_CHECK_INTERVAL nodes.
+TIME_MARGIN = 0.1
+
+
+def random_positions(seed, count, color=None):
+    """Positions of seeded random games, with moves for the player to move, of the given color if one is given."""
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        state = GameState()
+        for _ in range(rng.randrange(4, 30)):
+            moves = state.get_possible_moves()
+            if not moves:
+                break
+            state.perform_move(rng.choice(moves))
+        if state.get_possible_moves() and color in (None, state.curr_player):
+            positions.append(state)
+    return positions
+
+
+@pytest.fixture(scope='module')
+def search_pool():
+    pool = SearchPool(2, transposition_table_mb=1, move_ordering=True)
+    yield pool
+    pool.shutdown()
+
+
+def test_parallel_search_matches_serial_search(search_pool):
+    for state in random_positions(0, 6):
+        player = Player(1, state.curr_player, 1, 1)
+        player.curr_board = state.board
+        search_pool.new_search()
+        parallel = ParallelMiniMaxWithAlphaBetaPruning(player.utility, player.color, lambda: False,
+                                                       player.selective_deepening_criterion, search_pool)
+        serial = MiniMaxWithAlphaBetaPruning(player.utility, player.color, lambda: False,
+                                             player.selective_deepening_criterion)
+        value, move = parallel.search(state, SEARCH_DEPTH, -INFINITY, INFINITY, True)
+        assert not parallel.aborted
+        assert value == serial.search(state, SEARCH_DEPTH, -INFINITY, INFINITY, True)[0]
+        assert move in state.get_possible_moves()
+
+
+def test_parallel_search_is_aborted_after_shutdown():
+    pool = SearchPool(2)
+    pool.shutdown()
+    state = random_positions(1, 1)[0]
+    player = Player(1, state.curr_player, 1, 1)
+    player.curr_board = state.board
+    parallel = ParallelMiniMaxWithAlphaBetaPruning(player.utility, player.color, lambda: False,
+                                                   player.selective_deepening_criterion, pool)
+    parallel.search(state, SEARCH_DEPTH, -INFINITY, INFINITY, True)
+    assert parallel.aborted
+
+
+def test_parallel_get_move_returns_within_its_budget():
+    player = Player(1, RED_PLAYER, 0.5, 1, search_workers=2, transposition_table_mb=1, move_ordering=True)
+    try:
+        states = random_positions(2, 6, RED_PLAYER)
+        # The first move also waits for the worker processes to start.
+        player.get_move(copy.deepcopy(states[0]), states[0].get_possible_moves())
+        for state in states[1:]:
+            moves = state.get_possible_moves()
+            start = time.monotonic()
+            assert player.get_move(copy.deepcopy(state), moves) in moves
+            assert time.monotonic() - start <= player.time_for_current_move + TIME_MARGIN
+    finally:
+        player.game_over()
@@ -0,0 +1,38 @@
+"""Tests of the move generation by perft counts: the known counts of the opening position, and the recorded counts of
+the stored positions.
+"""
+import pytest
+from checkers.board import GameState
+from perft import perft, divide, parse_position, PerftResult, OPENING_NODES, TEST_POSITIONS
+
+OPENING_DEPTH = 7
+POSITION_DEPTH = 6
+
+
+@pytest.mark.parametrize('depth', range(1, OPENING_DEPTH + 1))
+def test_opening_position(depth):
+    assert perft(GameState(), depth).nodes == OPENING_NODES[depth]
+
+
+@pytest.mark.parametrize('name', sorted(TEST_POSITIONS))
+def test_stored_positions(name):
+    curr_player, rows, expected = TEST_POSITIONS[name]
+    state = parse_position(curr_player, rows)
+    for depth in range(1, POSITION_DEPTH + 1):
+        assert perft(state, depth) == PerftResult(*expected[depth]), depth
+
+
+@pytest.mark.parametrize('name', sorted(TEST_POSITIONS))
+def test_divide_sums_to_perft(name):
+    state = parse_position(*TEST_POSITIONS[name][:2])
+    for depth in (1, 3):
+        results = [result for _, result in divide(state, depth)]
+        assert PerftResult(*(sum(counts) for counts in zip(*results))) == perft(state, depth)
+
+
+@pytest.mark.parametrize('depth', [0, -1])
+def test_depth_below_one(depth):
+    with pytest.raises(ValueError):
+        perft(GameState(), depth)
+    with pytest.raises(ValueError):
+        divide(GameState(), depth)
@@ -0,0 +1,33 @@
+"""Tests of the search players: every one of them returns one of the possible moves, with its options on."""
+import copy
+import random
+import pytest
+from checkers.board import GameState
+
+PLAYERS = [
+    ('simple_player', {}),
+    ('simple_player', {'transposition_table_mb': 1, 'move_ordering': True, 'principal_variation': True}),
+    ('simple_player', {'evaluation_cache_entries': 1000}),
+    ('improved_player', {'quiescence_plies': 4, 'evaluation_cache_entries': 1000}),
+    ('better_h_player', {'transposition_table_mb': 1, 'evaluation_cache_entries': 1000}),
+    ('improved_better_h_player', {'batch_evaluation': True, 'principal_variation': True}),
+]
+
+
+@pytest.mark.parametrize('name, options', PLAYERS)
+def test_get_move_returns_a_possible_move(name, options):
+    player_module = __import__('players.{}'.format(name), fromlist=['Player'])
+    rng = random.Random(0)
+    state = GameState()
+    players = {}
+    for _ in range(12):
+        moves = state.get_possible_moves()
+        if not moves:
+            break
+        if state.curr_player not in players:
+            players[state.curr_player] = player_module.Player(1, state.curr_player, 0.05, 1, **options)
+        move = players[state.curr_player].get_move(copy.deepcopy(state), moves)
+        assert move in moves
+        state.perform_move(rng.choice(moves))
+    for player in players.values():
+        player.game_over()
@@ -0,0 +1,33 @@
+"""Tests of pondering: the answer for the reply that was played, and the end of the ponder process with the game."""
+import copy
+import multiprocessing
+import time
+from checkers.board import GameState
+from checkers.consts import RED_PLAYER
+from players.better_h_player import Player
+
+# Long enough for the ponder process to start and search the replies to depth 1 at least.
+PONDER_TIME = 2.0
+
+
+def test_answer_for_the_played_reply_and_shutdown():
+    children_before = set(multiprocessing.active_children())
+    player = Player(1, RED_PLAYER, 0.5, 1, transposition_table_mb=1, ponder=True)
+    state = GameState()
+    try:
+        move = player.get_move(copy.deepcopy(state), state.get_possible_moves())
+        state.perform_move(move)
+        time.sleep(PONDER_TIME)
+        assert set(multiprocessing.active_children()) - children_before
+        reply = state.get_possible_moves()[-1]
+        state.perform_move(reply)
+        possible_moves = state.get_possible_moves()
+        answer = player.ponderer.answer(state, possible_moves)
+        assert answer is not None
+        depth, value, best_move = answer
+        assert depth >= 1
+        assert best_move in possible_moves
+        assert player.ponderer.hits == 1
+    finally:
+        player.game_over()
+    assert set(multiprocessing.active_children()) <= children_before
@@ -0,0 +1,20 @@
+"""Tests of the player arguments of the game runner."""
+import pytest
+from run_game import parse_player
+
+
+def test_parse_player_without_options():
+    assert parse_player('simple_player') == ('simple_player', {})
+
+
+def test_parse_player_options():
+    name, options = parse_player('better_h_player:weights_path=w.json,transposition_table_mb=64,ponder=True,'
+                                 'quiescence_plies=4')
+    assert name == 'better_h_player'
+    assert options == {'weights_path': 'w.json', 'transposition_table_mb': 64, 'ponder': True,
+                       'quiescence_plies': 4}
+
+
+def test_parse_player_option_without_value():
+    with pytest.raises(ValueError):
+        parse_player('better_h_player:ponder')
@@ -0,0 +1,86 @@
+"""Tests of the alpha-beta search and of its transposition table."""
+import random
+import pytest
+from checkers.board import GameState
+from checkers.consts import RED_PLAYER, BLACK_PLAYER, MAX_TURNS_NO_JUMP
+from utils import MiniMaxWithAlphaBetaPruning, INFINITY
+from transposition import TranspositionTable
+from players.better_h_player import Player
+import players.simple_player
+from eval_cache import EvaluationCache
+
+SEARCH_DEPTH = 4
+MOVES_PER_GAME = 6
+
+
+def king_endgame(rng):
+    """A random position with a few kings of each color, and maybe a pawn or two, red to move."""
+    squares = rng.sample(range(32), rng.randint(4, 7))
+    red = black = kings = 0
+    for i, sq in enumerate(squares):
+        if i % 2 == 0:
+            red |= 1 << sq
+        else:
+            black |= 1 << sq
+        if rng.random() < 0.85:
+            kings |= 1 << sq
+    turns = rng.choice([0, 10, MAX_TURNS_NO_JUMP - 4, MAX_TURNS_NO_JUMP - 2])
+    return GameState.from_bitboards(red, black, kings, RED_PLAYER, turns)
+
+
+def root_value(player, state, transposition_table):
+    """The value of an iterative deepening search to SEARCH_DEPTH, as the players run it."""
+    minimax = MiniMaxWithAlphaBetaPruning(player.utility, player.color, lambda: False,
+                                          player.selective_deepening_criterion,
+                                          transposition_table=transposition_table)
+    value = None
+    for depth in range(1, SEARCH_DEPTH + 1):
+        value, _ = minimax.search(state, depth, -INFINITY, INFINITY, True)
+    return value
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_table_kept_across_moves_matches_no_table(seed):
+    """A table kept for the whole game, like the players keep it, gives the root values of a search without one,
+    even though the better_h utility depends on the root board and the values on the turns without jumps.
+    """
+    rng = random.Random(seed)
+    players = {color: Player(1, color, 1, 1) for color in (RED_PLAYER, BLACK_PLAYER)}
+    tables = {color: TranspositionTable(4) for color in (RED_PLAYER, BLACK_PLAYER)}
+    for _ in range(20):
+        state = king_endgame(rng)
+        for _ in range(MOVES_PER_GAME):
+            moves = state.get_possible_moves()
+            if not moves:
+                break
+            player = players[state.curr_player]
+            player.curr_board = state.board
+            table = tables[state.curr_player]
+            table.new_search()
+            assert root_value(player, state, table) == root_value(player, state, None)
+            state.perform_move(rng.choice(moves))
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_evaluation_cache_kept_across_moves_matches_no_cache(seed):
+    """The cache of simple_player, keyed by the Zobrist key, gives the root values of a search without it, also
+    when the turns without jumps reach the draw.
+    """
+    rng = random.Random(seed)
+    searchers = {color: (players.simple_player.Player(1, color, 1, 1), EvaluationCache(10000))
+                 for color in (RED_PLAYER, BLACK_PLAYER)}
+    for _ in range(20):
+        state = king_endgame(rng)
+        for _ in range(MOVES_PER_GAME):
+            moves = state.get_possible_moves()
+            if not moves:
+                break
+            player, cache = searchers[state.curr_player]
+            cached = MiniMaxWithAlphaBetaPruning(cache.wrap(player.utility, player.evaluation_key), player.color,
+                                                 lambda: False, player.selective_deepening_criterion)
+            plain = MiniMaxWithAlphaBetaPruning(player.utility, player.color, lambda: False,
+                                                player.selective_deepening_criterion)
+            assert cached.search(state, SEARCH_DEPTH, -INFINITY, INFINITY, True)[0] == \
+                plain.search(state, SEARCH_DEPTH, -INFINITY, INFINITY, True)[0]
+            state.perform_move(rng.choice(moves))
+    assert all(cache.hits > 0 for _, cache in searchers.values())
@@ -0,0 +1,28 @@
+"""Tests of the self-play data generator."""
+import numpy as np
+import self_play
+
+# Game 7 of seed 0 ends within its first draw of up to 60 random moves.
+SHORT_GAME = 7
+LONG_RANDOM_PLIES = 60
+
+
+def test_game_ended_by_its_random_moves_still_has_records():
+    records = self_play.play_game(SHORT_GAME, 'simple_player', 'simple_player', 1, LONG_RANDOM_PLIES, 0)
+    assert len(records) > 0
+    assert (records['game'] == SHORT_GAME).all()
+
+
+def test_game_does_not_depend_on_the_games_played_before():
+    first = self_play.play_game(0, 'simple_player', 'better_h_player', 2, 8, 0)
+    self_play.play_game(1, 'simple_player', 'better_h_player', 2, 8, 0)
+    assert np.array_equal(self_play.play_game(0, 'simple_player', 'better_h_player', 2, 8, 0), first)
+
+
+def test_resume_counts_every_game(tmp_path):
+    path = str(tmp_path / 'self_play.bin')
+    self_play.generate(SHORT_GAME + 1, path, depth=1, red_player='simple_player', black_player='simple_player',
+                       random_plies=LONG_RANDOM_PLIES, workers=1, seed=0)
+    f, done = self_play._resume(path)
+    f.close()
+    assert done == set(range(SHORT_GAME + 1))
@@ -0,0 +1,78 @@
+"""Tests of the endgame tablebase: its indexes, its values against a plain search, and the draw by the turns without
+jumps.
+"""
+import random
+import pytest
+from checkers.board import GameState
+from checkers.consts import MAX_TURNS_NO_JUMP
+from utils import MiniMaxWithAlphaBetaPruning, INFINITY
+from tablebase import Tablebase, generate, layout, position_index, position_at
+
+MAX_PIECES = 2
+SEARCH_DEPTH = 4
+SAMPLES = 500
+
+
+@pytest.fixture(scope='module')
+def tablebase(tmp_path_factory):
+    path = tmp_path_factory.mktemp('tablebase') / 'tablebase_{}.bin'.format(MAX_PIECES)
+    generate(MAX_PIECES, str(path), workers=1)
+    return Tablebase(str(path))
+
+
+def sample_positions(max_pieces, seed, count):
+    """Random possible positions of the tablebase of max_pieces, with their indexes."""
+    rng = random.Random(seed)
+    materials, blocks, _ = layout(max_pieces)
+    positions = []
+    while len(positions) < count:
+        counts = rng.choice(materials)
+        offset, size = blocks[counts]
+        index = rng.randrange(size)
+        position = position_at(counts, index)
+        if position is not None:
+            positions.append((offset + index, position))
+    return positions
+
+
+def search_value(state, tablebase=None):
+    """The value of a plain search to SEARCH_DEPTH for the player to move, which only sees the ends of the game."""
+    minimax = MiniMaxWithAlphaBetaPruning(lambda s: 0, state.curr_player, lambda: False, lambda s: False,
+                                          tablebase=tablebase)
+    value, _ = minimax.search(state, SEARCH_DEPTH, -INFINITY, INFINITY, True)
+    return value
+
+
+def test_position_index_round_trip():
+    _, blocks, _ = layout(3)
+    for index, position in sample_positions(3, 0, 2000):
+        assert position_index(blocks, *position) == index
+
+
+def test_values_match_search(tablebase):
+    for _, position in sample_positions(MAX_PIECES, 1, SAMPLES):
+        state = GameState.from_bitboards(*position)
+        value = tablebase.probe(state)
+        plies = value - 1
+        if value and plies <= SEARCH_DEPTH:
+            expected = INFINITY if plies % 2 == 1 else -INFINITY
+        else:
+            expected = 0
+        assert search_value(state) == expected, (position, value)
+
+
+def test_turns_without_jumps_draw(tablebase):
+    won = None
+    for _, position in sample_positions(MAX_PIECES, 2, SAMPLES):
+        state = GameState.from_bitboards(*position)
+        value = tablebase.probe(state)
+        if value and (value - 1) % 2 == 1 and value - 1 >= 3:
+            won = position
+            break
+    assert won is not None
+
+    state = GameState.from_bitboards(*won)
+    assert tablebase.score(state, state.curr_player) > 0
+    state = GameState.from_bitboards(*won, MAX_TURNS_NO_JUMP - 0.5)
+    assert tablebase.score(state, state.curr_player) == 0
+    assert search_value(state, tablebase) == search_value(state) == 0
@@ -0,0 +1,171 @@
+"""
+A headless tournament runner: plays many games between players in parallel processes.
+"""
+import argparse
+import contextlib
+import itertools
+import math
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from checkers.consts import RED_PLAYER, BLACK_PLAYER, TIE
+from run_game import GameRunner, parse_player
+
+# The z value of the two-sided 95% confidence intervals.
+CONFIDENCE_Z = 1.96
+
+
+def play_game(setup_time, time_per_k_turns, k, red_player, black_player, verbose=False):
+    """Plays a single game. Runs in a worker process.
+
+    :param red_player: The name of the module containing the red player, with its options if any, as for
+        GameRunner.
+    :param black_player: Same as 'red_player' parameter, but for the black one.
+    :param verbose: When False, everything the runner and the players print is discarded.
+    :return: The color of the winner, or TIE.
+    """
+    runner = GameRunner(setup_time, time_per_k_turns, k, 'y' if verbose else 'n', red_player, black_player)
+    if verbose:
+        winner = runner.run()
+    else:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            winner = runner.run()
+    # The player objects stay in the worker, only the color is sent back.
+    return winner if winner == TIE else winner[0]
+
+
+def score_to_elo(score):
+    """The Elo difference at which the expected score is the given one."""
+    if score <= 0:
+        return -math.inf
+    if score >= 1:
+        return math.inf
+    return -400 * math.log10(1 / score - 1)
+
+
+def elo_estimate(wins, losses, draws):
+    """Estimates an Elo difference from game results, with a 95% confidence interval.
+
+    The interval is computed on the mean score (a draw is half a point) with the normal approximation, and then
+    converted to Elo.
+
+    :return: A tuple: (Elo difference, lower bound, upper bound), or None if no games were played.
+    """
+    games = wins + losses + draws
+    if games == 0:
+        return None
+    score = (wins + 0.5 * draws) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    margin = CONFIDENCE_Z * math.sqrt(variance / games)
+    return score_to_elo(score), score_to_elo(score - margin), score_to_elo(score + margin)
+
+
+class Tournament:
+    def __init__(self, players, games_per_pairing, setup_time, time_per_k_turns, k, workers=None, verbose=False):
+        """Tournament initialization.
+
+        :param players: The names of the player modules, as for GameRunner, with their options if any. Every two
+            of them play each other, so one module may play with different options.
+        :param games_per_pairing: The number of games each two players play. The players swap colors every game.
+        :param setup_time: Setup time allowed for each player in seconds.
+        :param time_per_k_turns: Time allowed per k moves in seconds.
+        :param k: The k turns we measure time on. Must be a positive integer.
+        :param workers: The number of worker processes. Defaults to the number of CPUs.
+            The players measure their time with time.process_time, so a game is not slowed down by the other
+            workers as long as there are enough cores.
+        :param verbose: Whether to show the boards and everything the players print.
+        """
+        if len(set(players)) != len(players):
+            raise ValueError('Every player may appear only once: {}'.format(players))
+        if any(parse_player(player)[0] == 'interactive' for player in players):
+            raise ValueError('The interactive player can not play in a tournament')
+        self.players = list(players)
+        self.games_per_pairing = int(games_per_pairing)
+        self.setup_time = float(setup_time)
+        self.time_per_k_turns = float(time_per_k_turns)
+        self.k = int(k)
+        self.workers = workers
+        self.verbose = verbose
+        # (player, opponent) -> [wins, losses, draws] of player against opponent.
+        self.results = defaultdict(lambda: [0, 0, 0])
+
+    def games(self):
+        """The (red player, black player) pairs of all the tournament games."""
+        for first, second in itertools.combinations(self.players, 2):
+            for game_index in range(self.games_per_pairing):
+                yield (first, second) if game_index % 2 == 0 else (second, first)
+
+    def run(self):
+        """Plays all the games, one game per worker at a time.
+
+        :return: The results dict, of the form (player, opponent):[wins, losses, draws].
+        """
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(play_game, self.setup_time, self.time_per_k_turns, self.k,
+                                       red_player, black_player, self.verbose): (red_player, black_player)
+                       for red_player, black_player in self.games()}
+            for future in as_completed(futures):
+                red_player, black_player = futures[future]
+                self.record(red_player, black_player, future.result())
+        return dict(self.results)
+
+    def record(self, red_player, black_player, winner):
+        if winner == TIE:
+            self.results[(red_player, black_player)][2] += 1
+            self.results[(black_player, red_player)][2] += 1
+            return
+        won, lost = {RED_PLAYER: (red_player, black_player), BLACK_PLAYER: (black_player, red_player)}[winner]
+        self.results[(won, lost)][0] += 1
+        self.results[(lost, won)][1] += 1
+
+    def player_totals(self, player):
+        """The [wins, losses, draws] of the player against all the other players."""
+        return [sum(self.results[(player, opponent)][i] for opponent in self.players if opponent != player)
+                for i in range(3)]
+
+    def print_results(self):
+        """Prints the win/loss/draw matrix, the Elo difference of every pairing, and the Elo of every player
+        against the rest of the field."""
+        width = max(max(len(player) for player in self.players), len('W-L-D')) + 2
+        print('Win/loss/draw matrix (row player against column player):')
+        print(''.rjust(width) + ''.join(player.rjust(width) for player in self.players))
+        for player in self.players:
+            cells = ['-' if opponent == player else '{}-{}-{}'.format(*self.results[(player, opponent)])
+                     for opponent in self.players]
+            print(player.rjust(width) + ''.join(cell.rjust(width) for cell in cells))
+
+        print()
+        print('Elo difference (95% confidence interval):')
+        for player, opponent in itertools.combinations(self.players, 2):
+            estimate = elo_estimate(*self.results[(player, opponent)])
+            if estimate is not None:
+                print('  {} vs {}: {:+.0f} [{:+.0f}, {:+.0f}]'.format(player, opponent, *estimate))
+
+        print()
+        print('Elo against the field (95% confidence interval):')
+        for player in self.players:
+            totals = self.player_totals(player)
+            estimate = elo_estimate(*totals)
+            if estimate is not None:
+                print('  {}: {:+.0f} [{:+.0f}, {:+.0f}] ({}-{}-{})'.format(player, *estimate, *totals))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Plays every two of the given players against each other.')
+    parser.add_argument('setup_time', type=float, help='Setup time allowed for each player in seconds.')
+    parser.add_argument('time_per_k_turns', type=float, help='Time allowed per k moves in seconds.')
+    parser.add_argument('k', type=int, help='The k turns we measure time on.')
+    parser.add_argument('games_per_pairing', type=int, help='The number of games every two players play.')
+    parser.add_argument('players', nargs='+',
+                        help='The names of the player modules, e.g. simple_player, each optionally followed by '
+                             'options for its Player, e.g. better_h_player:transposition_table_mb=64,ponder=True.')
+    parser.add_argument('--workers', type=int, default=None, help='The number of worker processes.')
+    parser.add_argument('--verbose', action='store_true', help='Show the boards and what the players print.')
+    args = parser.parse_args()
+    if len(args.players) < 2:
+        parser.error('at least two players are needed')
+
+    tournament = Tournament(args.players, args.games_per_pairing, args.setup_time, args.time_per_k_turns, args.k,
+                            workers=args.workers, verbose=args.verbose)
+    tournament.run()
+    tournament.print_results()
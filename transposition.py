@@ -0,0 +1,103 @@
+"""A transposition table for the alpha-beta search.
+"""
+from collections import namedtuple
+from checkers.consts import MAX_TURNS_NO_JUMP
+from checkers.zobrist import ZOBRIST_TURNS
+
+# Bound types of a stored score.
+EXACT = 0
+LOWER_BOUND = 1  # The search failed high: the real value is at least the score.
+UPPER_BOUND = 2  # The search failed low: the real value is at most the score.
+
+# A rough size in bytes of one stored entry: the tuple, its key and score objects and a list slot.
+ENTRY_SIZE = 200
+
+TTEntry = namedtuple('TTEntry', ['key', 'depth', 'score', 'bound', 'best_move', 'generation'])
+
+
+def search_key(state):
+    """The key of a state in the table: its Zobrist key, with the turns since the last jump mixed in.
+
+    A position's value depends on the turns, since the utilities score it as a draw once they reach
+    MAX_TURNS_NO_JUMP. All the counts from MAX_TURNS_NO_JUMP on share a key, as they lead to the same values.
+    """
+    turns = min(int(state.turns_since_last_jump * 2), 2 * MAX_TURNS_NO_JUMP)
+    return state.zobrist_key ^ ZOBRIST_TURNS[turns]
+
+
+class TranspositionTable:
+    def __init__(self, size_mb):
+        """A table of search results keyed by search_key of the state.
+
+        Every bucket has two slots: a depth-preferred slot that keeps the deepest result of the current
+        generation, and an always-replace slot that takes everything else. The generation is advanced once per
+        move (see new_search), so results from earlier moves are replaced first.
+
+        The scores of earlier generations must only be used for their best moves: a utility may depend on the root
+        of the search as well as on the state (better_h_player compares the kings with the ones of the root), so a
+        score from an earlier root may be wrong for the current one.
+
+        :param size_mb: The memory budget of the table in megabytes.
+        """
+        self.num_buckets = max(1, int(size_mb * 2 ** 20) // (2 * ENTRY_SIZE))
+        self.depth_preferred = [None] * self.num_buckets
+        self.always_replace = [None] * self.num_buckets
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def new_search(self):
+        """Starts a new generation. Call it once before searching for a new move."""
+        self.generation += 1
+
+    def probe(self, key):
+        """Looks a state up.
+
+        :param key: The search_key of the state.
+        :return: The TTEntry stored for the state, or None.
+        """
+        index = key % self.num_buckets
+        entry = self.depth_preferred[index]
+        if entry is not None and entry.key == key:
+            self.hits += 1
+            return entry
+        entry = self.always_replace[index]
+        if entry is not None and entry.key == key:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def store(self, key, depth, score, bound, best_move):
+        """Stores the result of searching a state.
+
+        :param key: The search_key of the state.
+        :param depth: The depth the state was searched to.
+        :param score: The value the search returned.
+        :param bound: EXACT, LOWER_BOUND or UPPER_BOUND.
+        :param best_move: The best move found, or None.
+        """
+        index = key % self.num_buckets
+        entry = TTEntry(key, depth, score, bound, best_move, self.generation)
+        old = self.depth_preferred[index]
+        if old is None or old.key == key or old.generation != self.generation or depth >= old.depth:
+            if old is not None and old.key != key:
+                # The replaced entry is still worth keeping until something else needs the slot.
+                self.always_replace[index] = old
+            self.depth_preferred[index] = entry
+        else:
+            self.always_replace[index] = entry
+
+    def clear(self):
+        self.depth_preferred = [None] * self.num_buckets
+        self.always_replace = [None] * self.num_buckets
+        self.hits = 0
+        self.misses = 0
+
+    def hit_rate(self):
+        probes = self.hits + self.misses
+        return self.hits / probes if probes else 0.0
+
+    def __repr__(self):
+        return 'TranspositionTable(buckets={}, generation={}, hits={}, misses={})'.format(
+            self.num_buckets, self.generation, self.hits, self.misses)
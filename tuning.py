@@ -0,0 +1,226 @@
+"""Texel tuning: fits the evaluation weights of the better_h players to the results of self-play games.
+
+Every position written by self_play.py is described by the terms of BetterHPlayer.utility, each one the difference
+between the player to move and its opponent: the pawns, the kings, the tools in the center, the pawns on the back
+line, the attacked tools, and the two king terms of only_kings_util. The utility of a position is the dot product
+of these features with the weights (see load_weights in better_h_evaluation.py). The probability that the player to
+move wins is modelled as sigmoid(K * utility), a draw counting as half a win, and the weights minimize the logistic
+loss of the game results.
+
+K is fitted first, with the current weights, and then kept while the weights are fitted, so that the fitted weights
+stay on the scale of the current ones, and of INFINITY. Both fits are Newton's method, whose passes over the feature
+matrix run on shards of its rows in threads, since NumPy releases the GIL in them. The features are computed in
+worker processes, one chunk of the file per task.
+
+The king terms are taken as they are at the root of a search, where the distance between the kings has not
+changed: the player with more kings gets KING_ATTACK and the other one RUN_AWAY_KING. There, the two terms only
+differ by their sign, so the data only fixes the difference between their weights. The weights are also pulled
+towards the current ones by a small ridge term, which decides how that difference is split, and keeps the weights
+of features that the data never shows.
+
+Every tenth game is held out, and the loss is printed on it as well.
+
+    python tuning.py data [weights_path] [--player P] [--weights W] [--ridge R] [--workers N]
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+from checkers.consts import RED_PLAYER, BLACK_PLAYER
+import self_play
+import better_h_evaluation
+
+DEFAULT_PATH = 'weights.json'
+
+# The features, in the order of the columns of the feature matrix, named after the weights they are multiplied by.
+FEATURE_NAMES = better_h_evaluation.WEIGHT_NAMES
+
+# One game out of this many is held out of the fit.
+VALIDATION_EVERY = 10
+
+# The rows of the feature matrix in every shard of a pass of the fit.
+SHARD_ROWS = 1 << 16
+
+MAX_NEWTON_STEPS = 50
+NEWTON_TOLERANCE = 1e-9
+
+
+# ===============================================================================
+# Features
+# ===============================================================================
+
+def features(records):
+    """The feature matrix of self-play records. Runs in a worker process.
+
+    :param records: An array of self_play.RECORD_DTYPE records.
+    :return: A tuple: (An (N, len(FEATURE_NAMES)) float64 array, from the point of view of the player to move,
+             The float64 array of the targets: 1 for a win, 0.5 for a draw and 0 for a loss,
+             The bool array marking the records of held out games)
+    """
+    # NumPy is only needed when tuning, like in the batch evaluation of the player.
+    from players.improved_better_h_player import batch_eval
+    boards = batch_eval.encode_bitboards(records['red'], records['black'], records['kings'])
+    counts = {}
+    for color in (RED_PLAYER, BLACK_PLAYER):
+        sign = batch_eval.COLOR_SIGN[color]
+        pawns = boards == sign
+        counts[color] = {
+            'PAWN_WEIGHT': pawns.sum(axis=1),
+            'KING_WEIGHT': (boards == 2 * sign).sum(axis=1),
+            'CENTER': (boards * sign > 0)[:, batch_eval.CENTER_SQUARES].sum(axis=1),
+            'BACK_LINE': pawns[:, batch_eval.BACK_LINE_SQUARES[color]].sum(axis=1),
+            'ATTACKED': batch_eval.attacked(boards, color).sum(axis=1),
+        }
+    red, black = counts[RED_PLAYER], counts[BLACK_PLAYER]
+    columns = {name: red[name] - black[name] for name in red}
+    only_kings = (red['PAWN_WEIGHT'] < red['KING_WEIGHT']) & (black['PAWN_WEIGHT'] < black['KING_WEIGHT'])
+    # +1 when red has more kings, -1 when black has: KING_ATTACK for the one with more, RUN_AWAY_KING for the other.
+    lead = np.sign(red['KING_WEIGHT'] - black['KING_WEIGHT']) * only_kings
+    columns['KING_ATTACK'] = lead
+    columns['RUN_AWAY_KING'] = -lead
+
+    matrix = np.stack([columns[name] for name in FEATURE_NAMES], axis=1).astype(np.float64)
+    matrix *= np.where(records['side'] == self_play.PLAYER_SIDES[RED_PLAYER], 1.0, -1.0)[:, None]
+    targets = (records['result'].astype(np.float64) + 1) / 2
+    return matrix, targets, records['game'] % VALIDATION_EVERY == 0
+
+
+def load_features(path, workers=None):
+    """The features of all the records of a self-play file, computed in parallel over its chunks.
+
+    :return: The tuple of features, for all the records.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(features, self_play.read_chunks(path)))
+    if not results:
+        raise ValueError('{} holds no records'.format(path))
+    return tuple(np.concatenate(parts) for parts in zip(*results))
+
+
+# ===============================================================================
+# Fitting
+# ===============================================================================
+
+def _shard_terms(matrix, targets, weights, scale):
+    """The sums of the logistic loss, of its gradient and of its Hessian over some rows, for weights * scale."""
+    z = scale * (matrix @ weights)
+    probabilities = np.exp(-np.logaddexp(0, -z))
+    loss = (np.logaddexp(0, z) - targets * z).sum()
+    gradient = scale * (matrix.T @ (probabilities - targets))
+    hessian = scale * scale * ((matrix * (probabilities * (1 - probabilities))[:, None]).T @ matrix)
+    return loss, gradient, hessian
+
+
+class LogisticLoss:
+    def __init__(self, matrix, targets, executor):
+        """The mean logistic loss of a model sigmoid(scale * matrix @ weights) over a data set.
+
+        :param executor: A ThreadPoolExecutor that the passes over the rows are split between.
+        """
+        self.shards = [(matrix[start:start + SHARD_ROWS], targets[start:start + SHARD_ROWS])
+                       for start in range(0, len(matrix), SHARD_ROWS)]
+        self.rows = len(matrix)
+        self.executor = executor
+
+    def terms(self, weights, scale=1.0):
+        """The mean loss, with its gradient and Hessian with respect to the weights."""
+        results = list(self.executor.map(lambda shard: _shard_terms(shard[0], shard[1], weights, scale),
+                                         self.shards))
+        return tuple(sum(parts) / self.rows for parts in zip(*results))
+
+    def minimize(self, weights, scale=1.0, ridge=0.0):
+        """Minimizes the loss plus ridge / 2 * |weights - initial weights|^2 with Newton's method.
+
+        Far from the minimum, where the predictions saturate, a full Newton step overshoots, so the step is halved
+        until the objective decreases.
+
+        :return: The fitted weights.
+        """
+        prior = np.array(weights, dtype=np.float64)
+        weights = prior.copy()
+        penalty = ridge * np.eye(len(weights))
+
+        def objective(loss, point):
+            return loss + ridge / 2 * ((point - prior) ** 2).sum()
+
+        loss, gradient, hessian = self.terms(weights, scale)
+        for _ in range(MAX_NEWTON_STEPS):
+            value = objective(loss, weights)
+            gradient = gradient + ridge * (weights - prior)
+            # lstsq rather than solve, since without a ridge a feature the data never shows makes it singular.
+            step = np.linalg.lstsq(hessian + penalty, gradient, rcond=None)[0]
+            while True:
+                candidate = weights - step
+                loss, next_gradient, next_hessian = self.terms(candidate, scale)
+                if objective(loss, candidate) <= value or np.abs(step).max() < NEWTON_TOLERANCE:
+                    break
+                step = step / 2
+            weights, gradient, hessian = candidate, next_gradient, next_hessian
+            if np.abs(step).max() < NEWTON_TOLERANCE:
+                break
+        return weights
+
+
+def tune(data_path, weights_path, player_name='better_h_player', initial_weights_path=None, ridge=1e-4,
+         workers=None):
+    """Fits the weights of a player to a self-play file, and writes them to a weights file.
+
+    :param data_path: A file written by self_play.py.
+    :param weights_path: The weights file to write, a JSON object of the form weight name:value.
+    :param player_name: The player module whose weights are tuned, better_h_player or improved_better_h_player.
+    :param initial_weights_path: A weights file to start from, instead of the constants of the player module.
+    :param ridge: The strength of the pull towards the initial weights.
+    :param workers: The number of worker processes and threads. Defaults to the number of CPUs.
+    :return: The dict of the fitted weights.
+    """
+    player_module = __import__('players.{}'.format(player_name), fromlist=['load_weights'])
+    if set(player_module.WEIGHT_NAMES) != set(FEATURE_NAMES):
+        raise ValueError('{} has other weights than the tuned features'.format(player_name))
+    initial = player_module.load_weights(initial_weights_path)
+    weights = np.array([initial[name] for name in FEATURE_NAMES], dtype=np.float64)
+
+    start_time = time.perf_counter()
+    matrix, targets, held_out = load_features(data_path, workers)
+    print('{} positions, {} held out ({:.1f} s)'.format(len(matrix), held_out.sum(),
+                                                         time.perf_counter() - start_time))
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        training = LogisticLoss(matrix[~held_out], targets[~held_out], executor)
+        validation = LogisticLoss(matrix[held_out], targets[held_out], executor) if held_out.any() else None
+
+        def report(label, fitted, scale):
+            losses = [training.terms(fitted, scale)[0]]
+            if validation is not None:
+                losses.append(validation.terms(fitted, scale)[0])
+            print('{}: loss {} ({:.1f} s)'.format(label, ' / '.join('{:.6f}'.format(loss) for loss in losses),
+                                                  time.perf_counter() - start_time))
+
+        # K is the only weight of a model whose single feature is the utility.
+        utilities = LogisticLoss(matrix[~held_out] @ weights[:, None], targets[~held_out], executor)
+        scale = float(utilities.minimize([1.0])[0])
+        report('K = {:.6f}, training / held out'.format(scale), weights, scale)
+
+        fitted = training.minimize(weights, scale, ridge)
+        report('fitted weights, training / held out', fitted, scale)
+
+    result = {name: float(value) for name, value in zip(FEATURE_NAMES, fitted)}
+    with open(weights_path, 'w') as f:
+        json.dump(result, f, indent=2)
+    for name in FEATURE_NAMES:
+        print('  {}: {:.4f} -> {:.4f}'.format(name, initial[name], result[name]))
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fits the evaluation weights to self-play results.')
+    parser.add_argument('data', help='A file written by self_play.py.')
+    parser.add_argument('weights_path', nargs='?', default=DEFAULT_PATH, help='The weights file to write.')
+    parser.add_argument('--player', default='better_h_player', help='The player module whose weights are tuned.')
+    parser.add_argument('--weights', default=None, help='A weights file to start from.')
+    parser.add_argument('--ridge', type=float, default=1e-4, help='The pull towards the initial weights.')
+    parser.add_argument('--workers', type=int, default=None, help='The number of worker processes and threads.')
+    args = parser.parse_args()
+    tune(args.data, args.weights_path, player_name=args.player, initial_weights_path=args.weights,
+         ridge=args.ridge, workers=args.workers)
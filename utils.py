@@ -5,9 +5,18 @@ from threading import Thread
 from queue import Queue
 import time
 import copy
+from transposition import EXACT, LOWER_BOUND, UPPER_BOUND, search_key
+from checkers.consts import MAX_TURNS_NO_JUMP
 
 INFINITY = float(6000)
 
+# The search looks at the clock once every this many nodes.
+TIME_CHECK_INTERVAL = 64
+
+# Batch evaluation only pays for its fixed cost, and for evaluating children that a cutoff would have skipped,
+# when a depth 1 node has at least this many children.
+BATCH_MIN_LEAVES = 12
+
 
 class ExceededTimeError(RuntimeError):
     """Thrown when the given function exceeded its runtime.
@@ -64,60 +73,286 @@ def run_with_limited_time(func, args, kwargs, time_limit):
 
 class MiniMaxWithAlphaBetaPruning:
 
-    def __init__(self, utility, my_color, no_more_time, selective_deepening):
+    def __init__(self, utility, my_color, no_more_time, selective_deepening, transposition_table=None,
+                 move_orderer=None, batch_utility=None, tablebase=None, stats=None, quiescence_plies=0):
         """Initialize a MiniMax algorithms with alpha-beta pruning.
 
-        :param utility: The utility function. Should have state as parameter.
+        :param utility: The utility function. Should have state as parameter. The search detects states where the
+                        current player has no moves, so it is only called on states that have moves.
         :param my_color: The color of the player who runs this MiniMax search.
         :param no_more_time: A function that returns true if there is no more time to run this search, or false if
-                             there is still time left.
+                             there is still time left. Like the deadline given to search, it is checked once every
+                             TIME_CHECK_INTERVAL nodes.
         :param selective_deepening: A functions that gets the current state, and
                         returns True when the algorithm should continue the search
                         for the minimax value recursivly from this state.
+        :param transposition_table: An optional transposition.TranspositionTable shared by the searches.
+        :param move_orderer: An optional move_ordering.MoveOrderer. Without it, moves are searched in the order
+                             the state generates them.
+        :param batch_utility: An optional function that gets a list of states and returns the list of their utilities.
+                              When given, the leaves under a depth 1 node with at least BATCH_MIN_LEAVES children
+                              are evaluated by a single call to it.
+        :param tablebase: An optional tablebase.Tablebase. Every node below the root that it holds gets its exact
+                          value from it instead of being searched.
+        :param stats: An optional search_stats.SearchStats that the searches count their nodes, cutoffs and times
+                      into. Without it, nothing is counted or timed beyond self.nodes.
+        :param quiescence_plies: How many plies past the given depth the search may go to resolve captures. A leaf
+                                 where the player to move has a jump is expanded instead of evaluated, until a
+                                 position without jumps is reached or this many plies were added. 0 turns it off.
+                                 Captures are compulsory, so such a node has only capture moves and is searched
+                                 without a stand-pat: its static value is not a bound on its real value.
         """
         self.utility = utility
         self.my_color = my_color
         self.no_more_time = no_more_time
         self.selective_deepening = selective_deepening
+        self.transposition_table = transposition_table
+        self.move_orderer = move_orderer
+        self.batch_utility = batch_utility
+        self.tablebase = tablebase
+        self.stats = stats
+        self.quiescence_plies = quiescence_plies
+        self.pv_move = None
+        self.deadline = None
+        self.nodes = 0
+        self._next_check = TIME_CHECK_INTERVAL
+        self.aborted = False
 
-    def search(self, state, depth, alpha, beta, maximizing_player):
+    def search(self, state, depth, alpha, beta, maximizing_player, pv_move=None, deadline=None):
         """Start the MiniMax algorithm.
 
-        :param state: The state to start from.
+        :param state: The state to start from. It is not changed by the search.
         :param depth: The maximum allowed depth for the algorithm.
         :param alpha: The alpha of the alpha-beta pruning.
         :param alpha: The beta of the alpha-beta pruning.
         :param maximizing_player: Whether this is a max node (True) or a min node (False).
+        :param pv_move: The best move of the previous iteration, searched first when there is a move orderer.
+        :param deadline: An optional time.monotonic() value. When it passes (or no_more_time returns True), the
+                         search unwinds and sets self.aborted. The result is then the best of the root moves that
+                         were fully searched, and should not be trusted like a complete one.
         :return: A tuple: (The alpha-beta algorithm value, The move in case of max node or None in min mode)
         """
-        if self.no_more_time() or (depth <= 0 and not self.selective_deepening(state)):
+        self.pv_move = pv_move
+        self.deadline = deadline
+        self.nodes = 0
+        self._next_check = TIME_CHECK_INTERVAL
+        self.aborted = False
+        # The search performs and undoes the moves on a single state, so it works on its own copy.
+        result = self._search(copy.deepcopy(state), depth, alpha, beta, maximizing_player, 0)
+        if self.stats is not None:
+            self.stats.nodes += self.nodes
+        return result
+
+    def _search(self, state, depth, alpha, beta, maximizing_player, ply):
+        """The recursive part of search. The state is changed during the search and restored when it returns.
+
+        :param depth: The remaining depth, 0 or less in the quiescence search.
+        :param ply: The distance from the root of the search.
+        """
+        self.nodes += 1
+        # A threshold rather than a multiple, since the batch evaluation counts many nodes at once.
+        if self.nodes >= self._next_check:
+            self._next_check = self.nodes + TIME_CHECK_INTERVAL
+            if self.no_more_time() or (self.deadline is not None and time.monotonic() >= self.deadline):
+                self.aborted = True
+        if self.aborted:
+            # The value is ignored by the callers.
+            return 0, None
+        stats = self.stats
+        if stats is not None and ply > stats.max_ply:
+            stats.max_ply = ply
+        if ply > 0 and state.turns_since_last_jump >= MAX_TURNS_NO_JUMP:
+            # The runner ends the game as a draw as soon as the turns without jumps reach the limit.
+            if stats is not None:
+                stats.leaves += 1
+            return 0, None
+        if self.tablebase is not None and ply > 0:
+            score = self.tablebase.score(state, self.my_color)
+            if score is not None:
+                if stats is not None:
+                    stats.tablebase_hits += 1
+                    stats.leaves += 1
+                return score, None
+        if depth <= 0 and not self.selective_deepening(state) and not (
+                depth > -self.quiescence_plies and state.has_capture()):
+            if stats is not None:
+                return self._timed_leaf(state, stats), None
+            if not state.has_any_move():
+                return INFINITY if state.curr_player != self.my_color else -INFINITY, None
             return self.utility(state), None
 
-        next_moves = state.get_possible_moves()
+        hash_move = self.pv_move if ply == 0 else None
+        tt = self.transposition_table
+        if tt is not None and depth > 0:
+            key = search_key(state)
+            entry = tt.probe(key)
+            if stats is not None:
+                stats.tt_probes += 1
+                stats.tt_hits += entry is not None
+            if entry is not None:
+                hash_move = entry.best_move
+            # The scores of earlier moves were searched from another root, so only their best moves are used.
+            if entry is not None and entry.depth >= depth and entry.generation == tt.generation:
+                if entry.bound == EXACT:
+                    if stats is not None:
+                        stats.tt_cutoffs += 1
+                    return entry.score, entry.best_move if maximizing_player else None
+                elif entry.bound == LOWER_BOUND:
+                    alpha = max(alpha, entry.score)
+                else:
+                    beta = min(beta, entry.score)
+                if beta <= alpha:
+                    if stats is not None:
+                        stats.tt_cutoffs += 1
+                    return entry.score, entry.best_move if maximizing_player else None
+
+        if stats is not None:
+            start = time.perf_counter()
+            next_moves = state.get_possible_moves()
+            stats.move_generation_time += time.perf_counter() - start
+            stats.expanded += 1
+            stats.generated_moves += len(next_moves)
+        else:
+            next_moves = state.get_possible_moves()
         if not next_moves:
             # This player has no moves. So the previous player is the winner.
+            if stats is not None:
+                stats.leaves += 1
             return INFINITY if state.curr_player != self.my_color else -INFINITY, None
+        if self.move_orderer is not None:
+            next_moves = self.move_orderer.order_moves(next_moves, ply, hash_move)
+
+        leaf_values = None
+        if depth == 1 and self.batch_utility is not None and len(next_moves) >= BATCH_MIN_LEAVES:
+            leaf_values = self._leaf_values(state, next_moves)
 
+        window = (alpha, beta)
+        selected_move = next_moves[0]
         if maximizing_player:
-            selected_move = next_moves[0]
             best_move_utility = -INFINITY
-            for move in next_moves:
-                new_state = copy.deepcopy(state)
-                new_state.perform_move(move)
-                minimax_value, _ = self.search(new_state, depth - 1, alpha, beta, False)
+            for move_index, move in enumerate(next_moves):
+                if leaf_values is not None and leaf_values[move_index] is not None:
+                    minimax_value = leaf_values[move_index]
+                else:
+                    minimax_value = self._search_child(state, move, move_index, depth - 1, alpha, beta, False,
+                                                       ply + 1)
+                    if self.aborted:
+                        break
                 alpha = max(alpha, minimax_value)
                 if minimax_value > best_move_utility:
                     best_move_utility = minimax_value
                     selected_move = move
-                if beta <= alpha or self.no_more_time():
+                if beta <= alpha:
+                    if self.move_orderer is not None:
+                        self.move_orderer.record_cutoff(move, ply, depth, move_index)
+                    if stats is not None:
+                        stats.cutoffs += 1
+                        stats.first_move_cutoffs += move_index == 0
                     break
-            return alpha, selected_move
+            value = alpha
 
         else:
-            for move in next_moves:
-                new_state = copy.deepcopy(state)
-                new_state.perform_move(move)
-                beta = min(beta, self.search(new_state, depth - 1, alpha, beta, True)[0])
-                if beta <= alpha or self.no_more_time():
+            best_move_utility = INFINITY
+            for move_index, move in enumerate(next_moves):
+                if leaf_values is not None and leaf_values[move_index] is not None:
+                    minimax_value = leaf_values[move_index]
+                else:
+                    minimax_value = self._search_child(state, move, move_index, depth - 1, alpha, beta, True,
+                                                       ply + 1)
+                    if self.aborted:
+                        break
+                beta = min(beta, minimax_value)
+                if minimax_value < best_move_utility:
+                    best_move_utility = minimax_value
+                    selected_move = move
+                if beta <= alpha:
+                    if self.move_orderer is not None:
+                        self.move_orderer.record_cutoff(move, ply, depth, move_index)
+                    if stats is not None:
+                        stats.cutoffs += 1
+                        stats.first_move_cutoffs += move_index == 0
                     break
-            return beta, None
+            value = beta
+
+        if tt is not None and depth > 0 and not self.aborted:
+            # A result cut short by the time limit is not stored.
+            if value <= window[0]:
+                bound = UPPER_BOUND
+            elif value >= window[1]:
+                bound = LOWER_BOUND
+            else:
+                bound = EXACT
+            tt.store(key, depth, value, bound, selected_move)
+
+        return value, selected_move if maximizing_player else None
+
+    def _timed_leaf(self, state, stats):
+        """The value of a leaf, as _search scores it, counted and timed into stats."""
+        stats.leaves += 1
+        start = time.perf_counter()
+        has_any_move = state.has_any_move()
+        stats.move_generation_time += time.perf_counter() - start
+        if not has_any_move:
+            return INFINITY if state.curr_player != self.my_color else -INFINITY
+        start = time.perf_counter()
+        value = self.utility(state)
+        stats.utility_time += time.perf_counter() - start
+        return value
+
+    def _search_child(self, state, move, move_index, depth, alpha, beta, maximizing_player, ply):
+        """Searches the child that a move leads to with the given window. With stats, perform_move and undo_move
+        are timed.
+
+        :param move_index: The index of the move among the moves of its node, in the order they are searched.
+        The other parameters are the ones of _search, for the child.
+        :return: The value of the child.
+        """
+        stats = self.stats
+        if stats is None:
+            undo = state.perform_move(move)
+            value = self._search(state, depth, alpha, beta, maximizing_player, ply)[0]
+            state.undo_move(move, undo)
+            return value
+        start = time.perf_counter()
+        undo = state.perform_move(move)
+        stats.make_move_time += time.perf_counter() - start
+        value = self._search(state, depth, alpha, beta, maximizing_player, ply)[0]
+        start = time.perf_counter()
+        state.undo_move(move, undo)
+        stats.make_move_time += time.perf_counter() - start
+        return value
+
+    def _leaf_values(self, state, moves):
+        """Evaluates the children of a depth 1 node with one call to batch_utility.
+
+        :return: A list with the value of each move's child, or None for children that selective deepening or the
+                 quiescence search continue from, which are searched as usual.
+        """
+        stats = self.stats
+        start = time.perf_counter() if stats is not None else 0
+        values = [None] * len(moves)
+        leaves = []
+        leaf_indices = []
+        for i, move in enumerate(moves):
+            undo = state.perform_move(move)
+            if state.turns_since_last_jump >= MAX_TURNS_NO_JUMP:
+                values[i] = 0
+            elif not self.selective_deepening(state) and not (self.quiescence_plies and state.has_capture()):
+                if not state.has_any_move():
+                    values[i] = INFINITY if state.curr_player != self.my_color else -INFINITY
+                else:
+                    leaves.append(copy.deepcopy(state))
+                    leaf_indices.append(i)
+            state.undo_move(move, undo)
+        self.nodes += len(moves)
+        if stats is not None:
+            # The copies of the leaves are counted with the moves.
+            stats.make_move_time += time.perf_counter() - start
+            stats.leaves += sum(value is not None for value in values) + len(leaves)
+            start = time.perf_counter()
+        if leaves:
+            for i, value in zip(leaf_indices, self.batch_utility(leaves)):
+                values[i] = value
+        if stats is not None:
+            stats.utility_time += time.perf_counter() - start
+        return values